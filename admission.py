@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import signal
+import time
+from contextlib import asynccontextmanager
+
+import config
+import metrics
+
+admission_wait_seconds = metrics.Histogram(
+    "voice_admission_wait_seconds", "Time spent queued for a session or LLM turn slot.", ["kind"]
+)
+admission_rejections_total = metrics.Counter(
+    "voice_admission_rejections_total", "Sessions and turns refused by admission control.", ["kind", "reason"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a session or turn cannot be admitted; the message is shown to the user."""
+
+
+class TurnSlot:
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+
+    def release(self):
+        """Give the LLM slot back; safe to call more than once."""
+        semaphore, self._semaphore = self._semaphore, None
+        if semaphore is not None:
+            semaphore.release()
+
+
+class AdmissionController:
+    """Caps the voice work one worker takes on, so overload queues or fails fast.
+
+    ``admit_session()`` guards a whole /ws connection and ``turn()`` guards one
+    LLM turn. Both wait for a free slot if none is available, calling ``notify``
+    with a status message for the client, and raise ``AdmissionRejected`` when
+    the queue is full, the wait times out or the worker is draining. A limit of
+    0 means unlimited. Only used from the event loop.
+    """
+
+    def __init__(self, max_sessions: int = config.MAX_SESSIONS, max_turns: int = config.MAX_LLM_TURNS,
+                 queue_size: int = config.ADMISSION_QUEUE_SIZE):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.queue_size = queue_size
+        self._sessions = asyncio.Semaphore(max_sessions) if max_sessions > 0 else None
+        self._turns = asyncio.Semaphore(max_turns) if max_turns > 0 else None
+        self.sessions_waiting = 0
+        self.turns_in_flight = 0
+        self.draining = False
+        self._drain_task = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def turns_saturated(self) -> bool:
+        return self.draining or (self._turns is not None and self._turns.locked())
+
+    async def admit_session(self, notify=None):
+        """Wait for a session slot; pair every successful call with ``release_session``."""
+        if self.draining:
+            admission_rejections_total.inc("session", "draining")
+            raise AdmissionRejected("The server is restarting. Please reconnect in a moment.")
+        if self._sessions is None:
+            return
+        if self._sessions.locked():
+            if self.sessions_waiting >= self.queue_size:
+                admission_rejections_total.inc("session", "queue_full")
+                raise AdmissionRejected("The server is at capacity. Please try again shortly.")
+            if notify:
+                await notify(f"Server is busy; you are number {self.sessions_waiting + 1} in the queue...")
+        await self._acquire(self._sessions, "session", config.ADMISSION_QUEUE_TIMEOUT, waiting_counter=True)
+
+    def release_session(self):
+        if self._sessions is not None:
+            self._sessions.release()
+
+    @asynccontextmanager
+    async def turn(self, notify=None):
+        """Hold an LLM slot for one turn; yields a ``TurnSlot``.
+
+        The slot is freed by ``TurnSlot.release()`` once Gemini has finished, so
+        audio playback doesn't hold up other sessions' requests; the turn still
+        counts as in flight for draining until the block exits.
+        """
+        if self.draining:
+            admission_rejections_total.inc("turn", "draining")
+            raise AdmissionRejected("The server is restarting and can't start a new response. Please reconnect.")
+        if self._turns is not None:
+            if self._turns.locked() and notify:
+                await notify("Lots of people are talking to me right now, one moment...")
+            await self._acquire(self._turns, "turn", config.TURN_QUEUE_TIMEOUT)
+        slot = TurnSlot(self._turns)
+        self.turns_in_flight += 1
+        self._idle.clear()
+        try:
+            yield slot
+        finally:
+            slot.release()
+            self.turns_in_flight -= 1
+            if not self.turns_in_flight:
+                self._idle.set()
+
+    async def drain(self, timeout: float = config.DRAIN_TIMEOUT_SECONDS):
+        """Refuse new sessions and turns, then wait for in-flight turns to finish."""
+        self.draining = True
+        logging.info(f"Draining: waiting for {self.turns_in_flight} in-flight turn(s)...")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            logging.info("Drain complete.")
+        except asyncio.TimeoutError:
+            logging.warning(f"Drain timed out after {timeout}s with {self.turns_in_flight} turn(s) still running.")
+
+    def install_drain_on_sigterm(self):
+        """Drain before the server's own SIGTERM handling closes every WebSocket.
+
+        uvicorn fails open WebSockets as soon as it starts shutting down, which
+        would cut off responses mid-sentence. The first SIGTERM drains and then
+        hands over to the previous handler; a second one skips the wait.
+        """
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+        except ValueError:
+            return
+        if not callable(previous):
+            return
+        loop = asyncio.get_running_loop()
+
+        async def drain_then_exit(signum, frame):
+            await self.drain()
+            previous(signum, frame)
+
+        def on_sigterm(signum, frame):
+            if self.draining:
+                previous(signum, frame)
+                return
+            self.draining = True
+            loop.call_soon_threadsafe(start_drain, signum, frame)
+
+        def start_drain(signum, frame):
+            # Keep a reference: the loop only holds weak ones to running tasks
+            self._drain_task = loop.create_task(drain_then_exit(signum, frame))
+
+        try:
+            signal.signal(signal.SIGTERM, on_sigterm)
+        except ValueError:  # not the main thread, e.g. an embedded test server
+            return
+
+    async def _acquire(self, semaphore, kind: str, timeout: float, waiting_counter: bool = False):
+        started = time.monotonic()
+        if waiting_counter:
+            self.sessions_waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            admission_rejections_total.inc(kind, "timeout")
+            raise AdmissionRejected("The server is still busy. Please try again shortly.") from None
+        finally:
+            if waiting_counter:
+                self.sessions_waiting -= 1
+        admission_wait_seconds.observe(time.monotonic() - started, kind)
+
+
+admission = AdmissionController()
+metrics.Gauge("voice_admission_sessions_waiting", "Sessions queued for a free slot.",
+              function=lambda: admission.sessions_waiting)
+metrics.Gauge("voice_turns_in_flight", "Admitted voice turns not yet finished.", function=lambda: admission.turns_in_flight)
@@ -0,0 +1,21 @@
+import struct
+
+# Binary WebSocket audio frame sent to the browser:
+#   version (u8) | kind (u8) | turn id (u16) | sequence (u32) | raw audio bytes
+# Control messages (audio_start, audio_end, llm_chunk, ...) stay JSON text frames.
+AUDIO_FRAME_VERSION = 1
+AUDIO_FRAME_KIND_AUDIO = 1
+AUDIO_FRAME_HEADER = struct.Struct("!BBHI")
+
+
+def pack_audio_frame(turn_id: int, sequence: int, audio: bytes) -> bytes:
+    header = AUDIO_FRAME_HEADER.pack(AUDIO_FRAME_VERSION, AUDIO_FRAME_KIND_AUDIO, turn_id & 0xFFFF, sequence & 0xFFFFFFFF)
+    return header + audio
+
+
+def unpack_audio_frame(frame: bytes):
+    """Return ``(turn_id, sequence, audio)`` for a frame built by ``pack_audio_frame``."""
+    version, kind, turn_id, sequence = AUDIO_FRAME_HEADER.unpack_from(frame)
+    if version != AUDIO_FRAME_VERSION or kind != AUDIO_FRAME_KIND_AUDIO:
+        raise ValueError(f"Unsupported audio frame (version={version}, kind={kind})")
+    return turn_id, sequence, frame[AUDIO_FRAME_HEADER.size:]
@@ -0,0 +1,108 @@
+import logging
+import threading
+
+import config
+
+BYTES_PER_SAMPLE = 2  # 16-bit PCM from the browser
+
+
+class AudioIngest:
+    """Per-session microphone pipeline from the /ws receive loop to the STT service.
+
+    ``push`` is called on the event loop and never blocks: frames are appended to
+    a bounded buffer and a dedicated sender thread drains it in fixed-size
+    packets (``packet_ms`` of audio each). If the upstream stalls and the buffer
+    exceeds ``max_buffer_ms``, the oldest audio is dropped so the transcript
+    stays close to real time. An optional ``gate`` (see ``vad.VoiceActivityGate``)
+    runs on the sender thread and may suppress or rewrite each packet.
+    """
+
+    def __init__(self, send, sample_rate: int = 16000, packet_ms: int = config.AUDIO_PACKET_MS,
+                 max_buffer_ms: int = config.AUDIO_MAX_BUFFER_MS, gate=None):
+        self._send = send  # blocking callable taking one packet of bytes
+        self._gate = gate
+        self.packet_bytes = sample_rate * BYTES_PER_SAMPLE * packet_ms // 1000
+        self.max_buffer_bytes = max(sample_rate * BYTES_PER_SAMPLE * max_buffer_ms // 1000, self.packet_bytes)
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audio-ingest", daemon=True)
+
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        self.packets_sent = 0
+        self.overflows = 0
+        self.send_errors = 0
+
+    def start(self) -> "AudioIngest":
+        self._thread.start()
+        return self
+
+    def push(self, data: bytes):
+        with self._cond:
+            if self._closed:
+                return
+            self._buffer += data
+            self.bytes_received += len(data)
+
+            overflow = len(self._buffer) - self.max_buffer_bytes
+            if overflow > 0:
+                overflow += overflow % BYTES_PER_SAMPLE  # keep sample alignment
+                del self._buffer[:overflow]
+                self.bytes_dropped += overflow
+                self.overflows += 1
+                if self.overflows == 1 or self.overflows % 100 == 0:
+                    logging.warning(f"Audio ingest buffer full, dropped {self.bytes_dropped} bytes so far.")
+
+            if len(self._buffer) >= self.packet_bytes:
+                self._cond.notify()
+
+    def close(self, timeout: float = 1.0):
+        """Flush what is buffered and stop the sender thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        stats = {
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+            "bytes_dropped": self.bytes_dropped,
+            "packets_sent": self.packets_sent,
+            "overflows": self.overflows,
+            "send_errors": self.send_errors,
+            "buffered_bytes": len(self._buffer),
+        }
+        if self._gate:
+            stats["vad"] = self._gate.stats()
+        return stats
+
+    def _next_packet(self):
+        with self._cond:
+            while len(self._buffer) < self.packet_bytes and not self._closed:
+                self._cond.wait()
+            if not self._buffer:
+                return None
+            packet = bytes(self._buffer[:self.packet_bytes])
+            del self._buffer[:self.packet_bytes]
+            return packet
+
+    def _run(self):
+        while True:
+            packet = self._next_packet()
+            if packet is None:
+                return
+            if self._gate:
+                packet = self._gate.process(packet)
+                if packet is None:
+                    continue
+            try:
+                self._send(packet)
+                self.bytes_sent += len(packet)
+                self.packets_sent += 1
+            except Exception as e:
+                self.send_errors += 1
+                logging.error(f"Error sending audio to transcription service: {e}")
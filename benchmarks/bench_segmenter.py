@@ -0,0 +1,97 @@
+"""Microbenchmark: streaming sentence segmentation for the LLM -> TTS handoff.
+
+Compares the old approach (re-splitting the whole buffer with a regex on every
+LLM chunk) with SentenceSegmenter on a simulated Gemini stream, reporting CPU
+time per response and how many characters had to arrive before the first text
+could be sent to Murf.
+
+    python benchmarks/bench_segmenter.py [--responses 2000] [--chunk-chars 12]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import SentenceSegmenter  # noqa: E402
+
+SAMPLE_RESPONSE = (
+    "Ah, an inquiry worthy of careful consideration, for every move on the board reveals the player behind it. "
+    "Dr. Ashford's report puts growth at 3.5 percent this quarter, which is modest but far from trivial. "
+    "Consider the alternatives: retreat, consolidation, or a bold advance into uncharted territory. "
+    "Each carries its own costs, and the wise strategist weighs them before committing a single piece. "
+    "I would advise patience; the opponent who moves first often reveals the most. "
+    "Should you wish, I can outline a plan in three stages, e.g. reconnaissance, positioning and the decisive strike."
+)
+
+
+def stream_chunks(text, chunk_chars):
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+def regex_split(chunks):
+    """The previous main.py logic, kept here as the baseline."""
+    sentences_out = []
+    first_at = None
+    seen = 0
+    sentence_buffer = ""
+    for chunk in chunks:
+        seen += len(chunk)
+        sentence_buffer += chunk
+        sentences = re.split(r'(?<=[.?!])\s+', sentence_buffer)
+        if len(sentences) > 1:
+            for sentence in sentences[:-1]:
+                if sentence.strip():
+                    sentences_out.append(sentence.strip())
+                    if first_at is None:
+                        first_at = seen
+            sentence_buffer = sentences[-1]
+    if sentence_buffer.strip():
+        sentences_out.append(sentence_buffer.strip())
+    return sentences_out, first_at or seen
+
+
+def segmenter_split(chunks):
+    segmenter = SentenceSegmenter()
+    out = []
+    first_at = None
+    seen = 0
+    for chunk in chunks:
+        seen += len(chunk)
+        ready = segmenter.feed(chunk)
+        if ready and first_at is None:
+            first_at = seen
+        out.extend(ready)
+    remainder = segmenter.flush()
+    if remainder:
+        out.append(remainder)
+    return out, first_at or seen
+
+
+def bench(name, split, chunks, responses):
+    start = time.perf_counter()
+    for _ in range(responses):
+        out, first_at = split(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<18} {elapsed / responses * 1e6:9.1f} us/response   "
+          f"first TTS text after {first_at:4d} chars   {len(out):2d} TTS messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=12, help="characters per simulated LLM chunk")
+    parser.add_argument("--repeat", type=int, default=4, help="repeat the sample text to lengthen responses")
+    args = parser.parse_args()
+
+    text = " ".join([SAMPLE_RESPONSE] * args.repeat)
+    chunks = stream_chunks(text, args.chunk_chars)
+    print(f"{len(text)} chars per response in {len(chunks)} chunks, {args.responses} responses\n")
+    bench("regex re-split", regex_split, chunks, args.responses)
+    bench("SentenceSegmenter", segmenter_split, chunks, args.responses)
+
+
+if __name__ == "__main__":
+    main()
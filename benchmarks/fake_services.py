@@ -0,0 +1,232 @@
+"""Local stand-ins for Gemini, Murf and AssemblyAI used by the load-test harness.
+
+Nothing here talks to a paid service. The fakes reproduce the parts of each
+SDK/protocol that main.py touches, with configurable latencies so the voice
+pipeline can be driven end to end on one machine.
+"""
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import websockets
+
+from assemblyai.streaming.v3 import StreamingEvents
+
+WORDS = (
+    "Indeed the board is set and every piece has its purpose, yet the wise strategist "
+    "waits for the opponent to reveal intent before committing a single move. "
+).split()
+
+
+# --- Gemini ---------------------------------------------------------------
+
+class FakeGeminiChat:
+    def __init__(self, model):
+        self.model = model
+
+    def send_message(self, content, stream=False):
+        return self.model.stream_response()
+
+
+class FakeGeminiModel:
+    """Mimics ``genai.GenerativeModel`` streaming: blocking chunks at a fixed token rate."""
+
+    def __init__(self, tokens_per_response: int = 60, tokens_per_second: float = 80.0,
+                 first_token_delay: float = 0.3, tokens_per_chunk: int = 4):
+        self.tokens_per_response = tokens_per_response
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.tokens_per_chunk = tokens_per_chunk
+        self._client = None  # read by sessions._summarizer_for
+
+    def start_chat(self, history=None):
+        return FakeGeminiChat(self)
+
+    def stream_response(self):
+        return FakeGeminiStream(self)
+
+
+class FakeGeminiStream:
+    """A streaming response that, like Gemini's gRPC stream, can be cancelled mid-wait."""
+
+    def __init__(self, model):
+        self.model = model
+        self.text = ""
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self):
+        model = self.model
+        if self._cancelled.wait(model.first_token_delay):
+            return
+        for start in range(0, model.tokens_per_response, model.tokens_per_chunk):
+            count = min(model.tokens_per_chunk, model.tokens_per_response - start)
+            words = [WORDS[(start + i) % len(WORDS)] for i in range(count)]
+            if self._cancelled.wait(count / model.tokens_per_second):
+                return
+            chunk = " ".join(words) + " "
+            self.text += chunk
+            yield SimpleNamespace(text=chunk)
+
+
+# --- Tavily ---------------------------------------------------------------
+
+class FakeTavilyClient:
+    """Mimics ``TavilyClient.search``: blocks for ``delay`` seconds, returns canned results."""
+
+    def __init__(self, delay: float = 0.8):
+        self.delay = delay
+        self.searches = 0
+
+    def search(self, query, max_results=3):
+        self.searches += 1
+        time.sleep(self.delay)
+        return {"results": [
+            {"title": f"Result {i} for {query}", "content": " ".join(WORDS[:30]), "url": f"https://example.com/{i}"}
+            for i in range(max_results)
+        ]}
+
+
+# --- Murf -----------------------------------------------------------------
+
+class FakeMurfServer:
+    """A Murf stream-input WebSocket that answers each ``text`` message with synthetic audio."""
+
+    def __init__(self, synth_delay: float = 0.15, audio_bytes_per_char: int = 200, chunk_bytes: int = 4096):
+        self.synth_delay = synth_delay
+        self.audio_bytes_per_char = audio_bytes_per_char
+        self.chunk_bytes = chunk_bytes
+        self.connections = 0
+        self.characters = 0  # text characters actually synthesized
+        self.cleared = 0
+        self.port = None
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await websockets.serve(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}"
+
+    async def _handle(self, ws):
+        self.connections += 1
+        # Murf synthesizes each context's text in order
+        pending = {}
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                context_id = message.get("context_id")
+                if message.get("clear"):
+                    task = pending.pop(context_id, None)
+                    if task and not task.done():
+                        task.cancel()
+                        self.cleared += 1
+                    continue
+                if "text" not in message:
+                    continue
+                previous = pending.get(context_id)
+                pending[context_id] = asyncio.create_task(
+                    self._synthesize(ws, context_id, message["text"], message.get("end"), previous)
+                )
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _synthesize(self, ws, context_id, text, end, previous):
+        if previous:
+            await previous
+        await asyncio.sleep(self.synth_delay)
+        self.characters += len(text)
+        audio = os.urandom(max(len(text), 1) * self.audio_bytes_per_char)
+        try:
+            for start in range(0, len(audio), self.chunk_bytes):
+                chunk = base64.b64encode(audio[start:start + self.chunk_bytes]).decode()
+                await ws.send(json.dumps({"audio": chunk, "context_id": context_id}))
+            if end:
+                await ws.send(json.dumps({"final": True, "context_id": context_id}))
+        except websockets.ConnectionClosed:
+            pass
+
+
+# --- AssemblyAI -----------------------------------------------------------
+
+class FakeStreamingClient:
+    """Stands in for ``assemblyai.streaming.v3.StreamingClient``.
+
+    After ``speech_seconds`` of streamed audio it emits a scripted utterance as
+    partial ``TurnEvent``s followed by the final formatted one, then waits for
+    the next stretch of audio.
+    """
+
+    script = ["What is the weather in Tokyo today?"]
+    speech_seconds = 1.0
+    partials = 3
+    format_seconds = 0.25  # AssemblyAI's delay between end of turn and the formatted transcript
+    sample_rate = 16000
+
+    def __init__(self, options=None):
+        self._handlers = {}
+        self._audio_bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on(self, event, handler):
+        self._handlers[event] = handler
+
+    def _emit(self, event, payload):
+        handler = self._handlers.get(event)
+        if handler:
+            handler(self, payload)
+
+    def connect(self, params=None):
+        self._emit(StreamingEvents.Begin, SimpleNamespace(id="fake-session"))
+        self._thread = threading.Thread(target=self._run, name="fake-assemblyai", daemon=True)
+        self._thread.start()
+
+    def stream(self, data: bytes):
+        with self._lock:
+            self._audio_bytes += len(data)
+
+    def disconnect(self, terminate: bool = False):
+        self._stop.set()
+        self._emit(StreamingEvents.Termination, SimpleNamespace(audio_duration_seconds=0))
+
+    def _wait_for_audio(self, seconds: float) -> bool:
+        target = int(seconds * self.sample_rate * 2)
+        with self._lock:
+            self._audio_bytes = 0
+        while not self._stop.is_set():
+            with self._lock:
+                if self._audio_bytes >= target:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def _run(self):
+        for utterance in self.script:
+            if not self._wait_for_audio(self.speech_seconds):
+                return
+            words = utterance.split()
+            for i in range(1, self.partials + 1):
+                partial = " ".join(words[:max(1, len(words) * i // (self.partials + 1))])
+                self._emit(StreamingEvents.Turn, SimpleNamespace(
+                    transcript=partial, end_of_turn=False, turn_is_formatted=False))
+                time.sleep(0.05)
+            self._emit(StreamingEvents.Turn, SimpleNamespace(
+                transcript=utterance.lower().rstrip("?.!"), end_of_turn=True, turn_is_formatted=False))
+            time.sleep(self.format_seconds)
+            self._emit(StreamingEvents.Turn, SimpleNamespace(
+                transcript=utterance, end_of_turn=True, turn_is_formatted=True))
@@ -0,0 +1,348 @@
+"""End-to-end load test for the /ws voice pipeline against local fake services.
+
+Runs main.app under uvicorn with Gemini, Murf and AssemblyAI replaced by the
+stand-ins in fake_services.py, then drives N concurrent simulated browsers that
+stream microphone audio in real time and play back the binary audio frames.
+Reports time-to-first-audio (user's end of turn -> first audio frame)
+percentiles, turn throughput, server event-loop lag and memory per session.
+With --barge-in the simulated users keep talking over replies, and the report
+adds time-to-silence (interrupting turn -> audio_interrupt) and the Gemini
+worker threads and Murf characters spent on responses nobody heard. Replies then
+default to BARGE_IN_TOKENS so they are still playing when the next utterance
+starts, and the run fails if no barge-in was observed.
+
+    python benchmarks/loadtest.py [--clients 50] [--turns 3] [--token-rate 80]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.py needs Supabase settings to create its client; the load test never touches it
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_ANON_KEY", "loadtest")
+# The fake LLM repeats itself, so the TTS cache would hide Murf entirely; opt in with --tts-cache
+os.environ["TTS_CACHE_ENABLED"] = "true" if "--tts-cache" in sys.argv else "false"
+os.environ["SPECULATIVE_LLM_ENABLED"] = "true" if "--speculative" in sys.argv else "false"
+# Admission limits are read when the server modules are imported
+for flag, env in (("--max-sessions", "MAX_SESSIONS"), ("--max-llm-turns", "MAX_LLM_TURNS")):
+    if flag in sys.argv[:-1]:
+        os.environ[env] = sys.argv[sys.argv.index(flag) + 1]
+
+import logging  # noqa: E402
+
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+import llm_stream  # noqa: E402
+import main  # noqa: E402
+import murf_tts  # noqa: E402
+import sessions  # noqa: E402
+from audio_frames import unpack_audio_frame  # noqa: E402
+from fake_services import FakeGeminiModel, FakeMurfServer, FakeStreamingClient, FakeTavilyClient  # noqa: E402
+from prefetch import search_prefetch_total  # noqa: E402
+
+SCRIPT = [
+    "What is the weather in Tokyo today?",
+    "Tell me about the latest news in artificial intelligence.",
+    "How should I plan my week to finish the project?",
+    "Explain the strategy behind your last move.",
+]
+SAMPLE_RATE = 16000
+MIC_FRAME_MS = 20
+TOKENS = 60
+# At the default 80 tokens/s a reply this long is still playing when the next utterance ends
+BARGE_IN_TOKENS = 400
+API_KEYS = {"gemini": "fake-gemini", "assemblyai": "fake-assemblyai", "murf": "fake-murf"}
+SEARCH_API_KEYS = {**API_KEYS, "tavily": "fake-tavily"}
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (Linux), or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic wake-up fires on the server's event loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._running = True
+
+    async def run(self):
+        while self._running:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def stop(self):
+        self._running = False
+
+
+class ServerThread:
+    """uvicorn + fake Murf on their own event loop, like a real worker process."""
+
+    def __init__(self, port: int, murf: FakeMurfServer):
+        self.port = port
+        self.murf = murf
+        self.lag = LoopLagMonitor()
+        self.ready = threading.Event()
+        self.server = uvicorn.Server(uvicorn.Config(
+            main.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off", ws="websockets",
+        ))
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="loadtest-server", daemon=True)
+
+    async def _serve(self):
+        await self.murf.start()
+        murf_tts.MURF_STREAM_URL = self.murf.url
+        lag_task = asyncio.create_task(self.lag.run())
+        serve_task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        self.ready.set()
+        await serve_task
+        self.lag.stop()
+        await lag_task
+        await self.murf.stop()
+
+    def start(self):
+        self._thread.start()
+        if not self.ready.wait(15):
+            raise RuntimeError("server did not start")
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(10)
+
+
+async def run_client(url: str, turns: int, results: dict, turn_timeout: float, barge_in: bool = False,
+                     api_keys: dict = API_KEYS):
+    """One simulated browser: speak, wait for the reply to finish playing, repeat.
+
+    The mic is muted while a reply is pending so scripted turns never barge in,
+    unless ``barge_in`` is set: then the user keeps talking and each new turn
+    interrupts the reply still playing.
+    """
+    silence = bytes(SAMPLE_RATE * 2 * MIC_FRAME_MS // 1000)
+    listening = asyncio.Event()
+    listening.set()
+    ttfa = []
+    silence_after = []
+    completed = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        try:
+            await ws.send(json.dumps({"type": "api_keys", "keys": api_keys, "audio_transport": "binary"}))
+        except websockets.ConnectionClosed as e:  # turned away by admission control
+            results["errors"].append(f"{type(e).__name__}: {e}")
+            return
+
+        async def stream_microphone():
+            next_at = time.perf_counter()
+            while True:
+                if not listening.is_set():
+                    await listening.wait()
+                    next_at = time.perf_counter()
+                await ws.send(silence)
+                next_at += MIC_FRAME_MS / 1000
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+        mic_task = asyncio.create_task(stream_microphone())
+        try:
+            end_of_turn_at = None
+            interrupted_at = None
+            first_audio = False
+            deadline = time.perf_counter() + turn_timeout * (turns + 1)
+            while completed < turns:
+                raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.perf_counter()))
+                now = time.perf_counter()
+                if isinstance(raw, bytes):
+                    unpack_audio_frame(raw)
+                    if end_of_turn_at is not None and not first_audio:
+                        ttfa.append(now - end_of_turn_at)
+                        first_audio = True
+                    continue
+                message = json.loads(raw)
+                if message.get("type") == "transcription" and message.get("end_of_turn"):
+                    if end_of_turn_at is not None:
+                        # The previous reply was still playing: this turn is a barge-in
+                        completed += 1
+                        interrupted_at = now
+                    end_of_turn_at, first_audio = now, False
+                    if not barge_in:
+                        listening.clear()
+                elif message.get("type") == "audio_interrupt" and interrupted_at is not None:
+                    silence_after.append(now - interrupted_at)
+                    interrupted_at = None
+                elif message.get("type") == "audio_end" and end_of_turn_at is not None:
+                    completed += 1
+                    end_of_turn_at = None
+                    listening.set()
+                elif message.get("type") == "error":
+                    raise RuntimeError(message.get("message"))
+        except (asyncio.TimeoutError, websockets.ConnectionClosed, RuntimeError) as e:
+            results["errors"].append(f"{type(e).__name__}: {e}")
+        finally:
+            mic_task.cancel()
+    results["ttfa"].extend(ttfa)
+    results["silence"].extend(silence_after)
+    results["turns"] += completed
+
+
+def report(args, results, elapsed, lag_samples, rss_before, rss_peak, murf):
+    ttfa_ms = [t * 1000 for t in results["ttfa"]]
+    silence_ms = [t * 1000 for t in results["silence"]]
+    lag_ms = [t * 1000 for t in lag_samples]
+    out = {
+        "clients": args.clients,
+        "turns_completed": results["turns"],
+        "turns_expected": args.clients * args.turns,
+        "errors": len(results["errors"]),
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(results["turns"] / elapsed, 2) if elapsed else 0.0,
+        "ttfa_ms": {f"p{p}": round(percentile(ttfa_ms, p), 1) for p in (50, 90, 95, 99)},
+        "ttfa_ms_mean": round(statistics.mean(ttfa_ms), 1) if ttfa_ms else None,
+        "loop_lag_ms": {
+            "p50": round(percentile(lag_ms, 50), 2),
+            "p99": round(percentile(lag_ms, 99), 2),
+            "max": round(max(lag_ms), 2) if lag_ms else None,
+        },
+        "rss_per_session_kb": round((rss_peak - rss_before) / args.clients / 1024, 1) if rss_peak else None,
+        "murf_connections": murf.connections,
+        "murf_characters": murf.characters,
+    }
+    if args.search_ms is not None:
+        out["search_prefetch"] = {result[0]: int(count) for result, count in search_prefetch_total._values.items()}
+    if args.barge_in:
+        out["barge_ins"] = len(silence_ms)
+        out["time_to_silence_ms"] = {f"p{p}": round(percentile(silence_ms, p), 1) for p in (50, 99)}
+        out["murf_contexts_cleared"] = murf.cleared
+        out["llm_threads_left"] = results["llm_threads_left"]
+    if args.json:
+        return json.dumps(out, indent=2)
+
+    lines = [
+        f"{out['clients']} clients x {args.turns} turns: {out['turns_completed']}/{out['turns_expected']} "
+        f"completed, {out['errors']} errors in {out['elapsed_s']}s ({out['turns_per_s']} turns/s)",
+        "time to first audio  " + "  ".join(f"{k}={v}ms" for k, v in out["ttfa_ms"].items()),
+        "event loop lag       " + "  ".join(f"{k}={v}ms" for k, v in out["loop_lag_ms"].items()),
+        f"memory per session   {out['rss_per_session_kb']} KiB RSS",
+        f"murf connections     {murf.connections} ({murf.characters} characters synthesized)",
+    ]
+    if args.search_ms is not None:
+        lines.append("search prefetch      " + "  ".join(f"{k}={v}" for k, v in sorted(out["search_prefetch"].items())))
+    if args.barge_in:
+        lines += [
+            f"barge-ins            {out['barge_ins']}, time to silence "
+            + "  ".join(f"{k}={v}ms" for k, v in out["time_to_silence_ms"].items()),
+            f"murf contexts cleared {out['murf_contexts_cleared']}, llm threads left running {out['llm_threads_left']}",
+        ]
+    for error in sorted(set(results["errors"]))[:5]:
+        lines.append(f"  error: {error}")
+    return "\n".join(lines)
+
+
+async def drive(args, url: str, results: dict, on_peak):
+    async def start_client(i):
+        await asyncio.sleep(i * args.ramp / max(args.clients, 1))
+        api_keys = SEARCH_API_KEYS if args.search_ms is not None else API_KEYS
+        await run_client(url, args.turns, results, args.turn_timeout, args.barge_in, api_keys)
+
+    tasks = [asyncio.create_task(start_client(i)) for i in range(args.clients)]
+    # Sample memory once every client is connected and mid-conversation
+    await asyncio.sleep(args.ramp + FakeStreamingClient.speech_seconds + 0.5)
+    on_peak()
+    await asyncio.gather(*tasks)
+    # Interrupted turns must not leave Gemini worker threads behind
+    await asyncio.sleep(1.0)
+    results["llm_threads_left"] = int(llm_stream.active_workers._value)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50, help="concurrent simulated browsers")
+    parser.add_argument("--turns", type=int, default=3, help="voice turns per client")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which clients connect")
+    parser.add_argument("--speech-seconds", type=float, default=1.0, help="mic audio before each scripted turn")
+    parser.add_argument("--tokens", type=int,
+                        help=f"tokens per fake Gemini response (default {TOKENS}, or {BARGE_IN_TOKENS} with --barge-in)")
+    parser.add_argument("--token-rate", type=float, default=80.0, help="fake Gemini tokens per second")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--murf-delay-ms", type=float, default=150.0, help="fake Murf synthesis delay per text message")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--format-ms", type=float, default=250.0, help="fake AssemblyAI end-of-turn formatting delay")
+    parser.add_argument("--tts-cache", action="store_true", help="keep the sentence audio cache enabled")
+    parser.add_argument("--speculative", action="store_true", help="enable speculative LLM generation")
+    parser.add_argument("--search-ms", type=float, help="give clients a fake Tavily key with this search latency")
+    parser.add_argument("--max-sessions", type=int, help="admission limit on concurrent sessions")
+    parser.add_argument("--max-llm-turns", type=int, help="admission limit on in-flight LLM turns")
+    parser.add_argument("--barge-in", action="store_true", help="keep talking over replies so every turn interrupts")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's INFO logs and stdout")
+    args = parser.parse_args()
+    if args.tokens is None:
+        args.tokens = BARGE_IN_TOKENS if args.barge_in else TOKENS
+
+    fake_model = FakeGeminiModel(
+        tokens_per_response=args.tokens,
+        tokens_per_second=args.token_rate,
+        first_token_delay=args.llm_first_token_ms / 1000,
+    )
+    sessions._build_gemini_model = lambda api_key: fake_model
+    if args.search_ms is not None:
+        sessions._build_tavily_client = lambda api_key: FakeTavilyClient(delay=args.search_ms / 1000)
+    sessions._summarizer_for = lambda model: (lambda prompt: "The user and Lelouch discussed several topics.")
+    FakeStreamingClient.script = (SCRIPT * (args.turns // len(SCRIPT) + 1))[:args.turns]
+    FakeStreamingClient.speech_seconds = args.speech_seconds
+    FakeStreamingClient.format_seconds = args.format_ms / 1000
+    # main resolves the AssemblyAI SDK at connect time, so patch the SDK module itself
+    main.load_streaming_sdk().StreamingClient = FakeStreamingClient
+
+    stdout = sys.stdout
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        sys.stdout = open(os.devnull, "w")  # main.py prints every streamed LLM chunk
+
+    server = ServerThread(args.port, FakeMurfServer(synth_delay=args.murf_delay_ms / 1000))
+    server.start()
+    results = {"ttfa": [], "silence": [], "turns": 0, "errors": [], "llm_threads_left": None}
+    rss_before = rss_bytes()
+    peak = {"rss": 0}
+    url = f"ws://127.0.0.1:{args.port}/ws"
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(drive(args, url, results, lambda: peak.update(rss=rss_bytes())))
+    finally:
+        elapsed = time.perf_counter() - start
+        server.stop()
+        sys.stdout = stdout
+
+    print(report(args, results, elapsed, server.lag.samples, rss_before, peak["rss"], server.murf))
+    if args.barge_in and not results["silence"]:
+        print(f"FAIL: no barge-ins observed; replies of {args.tokens} tokens finished before the next turn "
+              "(raise --tokens)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,136 @@
+"""Cold-start benchmark: import time of main.py and time to the first HTTP response.
+
+Each run starts a fresh interpreter, so nothing is shared between samples.
+``import main`` is timed in-process, and the voice/database SDKs it must not
+load eagerly are listed if they appear in sys.modules. Then uvicorn is started
+as a new process (with SDK preloading off, as on a serverless instance) and
+polled until ``--path`` answers. --check exits non-zero if an SDK is imported
+eagerly, the median import time exceeds --max-import-ms, or the route answered
+with a 5xx (a broken route can answer fast).
+
+    python benchmarks/startup.py [--runs 5] [--path /auth] [--check --max-import-ms 1200]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; an HTTP-only cold start must not load any of them
+LAZY_MODULES = ("assemblyai", "google.generativeai", "tavily", "supabase", "postgrest", "numpy")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_ms": elapsed * 1000, "eager": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    # The Supabase client is created lazily, so placeholders are enough to import main
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_ANON_KEY", "startup-benchmark")
+    env["PRELOAD_SDKS"] = "false"
+    return env
+
+
+def measure_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(path: str, timeout: float = 30.0) -> dict:
+    """Spawn uvicorn and time how long until ``path`` returns any HTTP response."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code  # still a response from the app
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before answering")
+                time.sleep(0.01)
+                continue
+            return {"first_response_ms": (time.perf_counter() - start) * 1000, "status": status}
+        raise RuntimeError(f"no response from {path} within {timeout}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/auth", help="HTTP route timed for the first response")
+    parser.add_argument("--check", action="store_true", help="fail on eager SDK imports or a slow import")
+    parser.add_argument("--max-import-ms", type=float, default=1200.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    responses = [measure_first_response(args.path) for _ in range(args.runs)]
+    import_ms = [run["import_ms"] for run in imports]
+    response_ms = [run["first_response_ms"] for run in responses]
+    eager = sorted({module for run in imports for module in run["eager"]})
+
+    out = {
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(import_ms), 1), "min": round(min(import_ms), 1)},
+        "first_response_ms": {"median": round(statistics.median(response_ms), 1), "min": round(min(response_ms), 1)},
+        "first_response_status": responses[-1]["status"],
+        "path": args.path,
+        "eager_sdk_imports": eager,
+    }
+    if args.json:
+        print(json.dumps(out, indent=2))
+    else:
+        print(f"import main            median={out['import_ms']['median']}ms  min={out['import_ms']['min']}ms")
+        print(f"first response {args.path:<7} median={out['first_response_ms']['median']}ms  "
+              f"min={out['first_response_ms']['min']}ms  (HTTP {out['first_response_status']})")
+        print(f"eager SDK imports      {', '.join(eager) or 'none'}")
+
+    if args.check:
+        problems = []
+        if eager:
+            problems.append(f"SDKs imported eagerly by main: {', '.join(eager)}")
+        if out["import_ms"]["median"] > args.max_import_ms:
+            problems.append(f"median import {out['import_ms']['median']}ms exceeds {args.max_import_ms}ms")
+        server_errors = sorted({run["status"] for run in responses if run["status"] >= 500})
+        if server_errors:
+            problems.append(f"{args.path} answered with HTTP {', '.join(map(str, server_errors))}")
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
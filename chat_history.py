@@ -0,0 +1,275 @@
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+# postgrest (installed with supabase-py) is imported inside the query functions,
+# which only run on db.py's pool, so routes that never query skip loading it
+
+MAX_PAGE_SIZE = 100
+PREVIEW_CHARS = 100
+
+# message_count and preview are generated columns (see README "Supabase Setup"),
+# so listing never reads the chat_data blobs
+SUMMARY_COLUMNS = "id, created_at, message_count, preview"
+FALLBACK_COLUMNS = "id, created_at, chat_data"
+UNDEFINED_COLUMN = "42703"
+
+_summary_columns_available = True
+_conversation_column_available = True
+
+
+class ConversationNotFound(LookupError):
+    """The conversation's chat_history row does not exist (never created, or deleted)."""
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (created_at, id) from a cursor; raises ValueError if it is malformed.
+
+    The cursor comes from the client and ends up in a PostgREST filter, so
+    created_at must parse as an ISO-8601 timestamp (it is returned in
+    canonical form) and id must be an integer.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, chat_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(chat_id, int) or isinstance(chat_id, bool):
+            raise TypeError("cursor must hold [timestamp string, integer id]")
+        return datetime.fromisoformat(created_at).isoformat(), chat_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def summarize_chat(row: dict) -> dict:
+    """Metadata for one saved chat: id, created_at, message count and preview."""
+    if "chat_data" not in row:
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "message_count": row.get("message_count") or 0,
+            "preview": row.get("preview") or "",
+        }
+    messages = row.get("chat_data") or []
+    first_user_message = next((msg for msg in messages if msg.get("sender") == "user"), None)
+    return {
+        "id": row["id"],
+        "created_at": row["created_at"],
+        "message_count": len(messages),
+        "preview": (first_user_message or {}).get("text", "")[:PREVIEW_CHARS],
+    }
+
+
+def fetch_history_page(supabase, user_id: str, limit: int, cursor: str = None) -> dict:
+    """One page of a user's chats, newest first, as ``{"data": [...], "next_cursor": ...}``.
+
+    Keyset pagination on (created_at, id) so deep pages cost the same as the first.
+    """
+    from postgrest.exceptions import APIError
+
+    global _summary_columns_available, _conversation_column_available
+    after = decode_cursor(cursor) if cursor else None
+
+    def query(columns):
+        request = (
+            supabase.table('chat_history').select(columns).eq('user_id', user_id)
+            .order('created_at', desc=True).order('id', desc=True).limit(limit + 1)
+        )
+        if after:
+            created_at, chat_id = after
+            request = request.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{chat_id})'
+            )
+        return request.execute().data
+
+    while True:
+        columns = SUMMARY_COLUMNS if _summary_columns_available else FALLBACK_COLUMNS
+        if _conversation_column_available:
+            columns += ", conversation_id"
+        try:
+            rows = query(columns)
+            break
+        except APIError as e:
+            if e.code != UNDEFINED_COLUMN:
+                raise
+            if _conversation_column_available and 'conversation_id' in str(e.message):
+                _conversation_column_available = False
+            elif _summary_columns_available:
+                _summary_columns_available = False
+                logging.warning("chat_history has no message_count/preview columns; listing reads chat_data instead.")
+            else:
+                raise
+
+    page = [summarize_chat(row) for row in rows[:limit]]
+    _add_pending_summaries(supabase, rows[:limit], page)
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    return {"data": page, "next_cursor": next_cursor}
+
+
+def _add_pending_summaries(supabase, rows: list, page: list):
+    """Count appended messages that are not compacted yet, and preview them if the row has none.
+
+    One query for the whole page; compaction keeps chat_messages short, so
+    this reads at most a few CHAT_COMPACT_EVERY-sized tails.
+    """
+    conversation_ids = [row['conversation_id'] for row in rows if row.get('conversation_id')]
+    if not conversation_ids:
+        return
+    pending = {}
+    result = (
+        supabase.table('chat_messages').select('conversation_id, seq, message')
+        .in_('conversation_id', conversation_ids).order('seq').execute()
+    )
+    for message_row in result.data:
+        pending.setdefault(message_row['conversation_id'], []).append(message_row)
+    for row, summary in zip(rows, page):
+        tail = pending.get(row.get('conversation_id'))
+        if not tail:
+            continue
+        merged = summary['message_count']
+        messages = _contiguous([r for r in tail if r['seq'] >= merged], merged)
+        summary['message_count'] = merged + len(messages)
+        if not summary['preview']:
+            first_user_message = next((msg for msg in messages if msg.get('sender') == 'user'), None)
+            summary['preview'] = (first_user_message or {}).get('text', '')[:PREVIEW_CHARS]
+
+
+def fetch_chat(supabase, chat_id: int):
+    """One saved chat, including appended messages that have not been compacted yet."""
+    from postgrest.exceptions import APIError
+
+    global _conversation_column_available
+    columns = 'id, created_at, chat_data, conversation_id' if _conversation_column_available else 'id, created_at, chat_data'
+    try:
+        result = supabase.table('chat_history').select(columns).eq('id', chat_id).limit(1).execute()
+    except APIError as e:
+        if e.code != UNDEFINED_COLUMN or not _conversation_column_available:
+            raise
+        _conversation_column_available = False
+        return fetch_chat(supabase, chat_id)
+    if not result.data:
+        return None
+    chat = result.data[0]
+    if chat.get('conversation_id'):
+        chat_data = chat.get('chat_data') or []
+        pending = fetch_pending_messages(supabase, chat['conversation_id'], len(chat_data))
+        chat['chat_data'] = chat_data + _contiguous(pending, len(chat_data))
+    return chat
+
+
+# --- Incremental conversations ---------------------------------------------
+# Appended messages land in chat_messages, keyed by (conversation_id, seq), and
+# are periodically folded into the conversation's single chat_history row.
+
+def ensure_conversation(supabase, conversation_id: str, user_id: str):
+    from postgrest.types import ReturnMethod
+
+    supabase.table('chat_history').upsert(
+        {'conversation_id': conversation_id, 'user_id': user_id, 'chat_data': []},
+        on_conflict='conversation_id', ignore_duplicates=True, returning=ReturnMethod.minimal,
+    ).execute()
+
+
+def append_messages(supabase, rows: list):
+    """Insert message rows; rows whose (conversation_id, seq) already exist are skipped."""
+    from postgrest.types import ReturnMethod
+
+    supabase.table('chat_messages').upsert(
+        rows, on_conflict='conversation_id,seq', ignore_duplicates=True, returning=ReturnMethod.minimal,
+    ).execute()
+
+
+def fetch_pending_messages(supabase, conversation_id: str, from_seq: int) -> list:
+    result = (
+        supabase.table('chat_messages').select('seq, message').eq('conversation_id', conversation_id)
+        .gte('seq', from_seq).order('seq').execute()
+    )
+    return result.data
+
+
+def _contiguous(rows: list, start: int) -> list:
+    messages = []
+    for row in rows:
+        if row['seq'] != start + len(messages):
+            break
+        messages.append(row['message'])
+    return messages
+
+
+def conversation_exists(supabase, conversation_id: str) -> bool:
+    result = (
+        supabase.table('chat_history').select('id')
+        .eq('conversation_id', conversation_id).limit(1).execute()
+    )
+    return bool(result.data)
+
+
+def compact_conversation(supabase, conversation_id: str) -> int:
+    """Fold appended messages into the chat_history row; returns its message count.
+
+    Safe to run concurrently: the row is only updated if chat_data still has
+    the length this call read (checked on the array itself, so the generated
+    message_count column is not needed), and messages are deleted only once
+    merged. Raises ConversationNotFound if the row is gone, after dropping the
+    messages that were appended to it.
+    """
+    result = (
+        supabase.table('chat_history').select('id, chat_data')
+        .eq('conversation_id', conversation_id).limit(1).execute()
+    )
+    if not result.data:
+        supabase.table('chat_messages').delete().eq('conversation_id', conversation_id).execute()
+        raise ConversationNotFound(f"Conversation {conversation_id} does not exist")
+    row = result.data[0]
+    chat_data = row.get('chat_data') or []
+    merged = len(chat_data)
+    new_messages = _contiguous(fetch_pending_messages(supabase, conversation_id, merged), merged)
+    if new_messages:
+        update = (
+            supabase.table('chat_history').update({'chat_data': chat_data + new_messages})
+            .eq('id', row['id']).is_(f'chat_data->{merged}', 'null')
+        )
+        if merged:
+            update = update.not_.is_(f'chat_data->{merged - 1}', 'null')
+        if not update.execute().data:
+            return merged  # another worker compacted first
+        merged += len(new_messages)
+    supabase.table('chat_messages').delete().eq('conversation_id', conversation_id).lt('seq', merged).execute()
+    return merged
+
+
+def delete_chat(supabase, chat_id: int):
+    """Delete a chat_history row together with any messages appended to it.
+
+    The row goes first, so an append racing with the delete finds no
+    conversation instead of writing messages nobody can reach.
+    """
+    deleted = supabase.table('chat_history').delete().eq('id', chat_id).execute().data
+    for row in deleted:
+        if row.get('conversation_id'):
+            supabase.table('chat_messages').delete().eq('conversation_id', row['conversation_id']).execute()
+    return deleted
+
+
+def _etag(payload) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+def conditional_json(request: Request, payload) -> Response:
+    """JSON response with an ETag; answers 304 when the client already has this body."""
+    etag = _etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # This line is crucial - it loads the .env file
@@ -7,4 +8,99 @@ load_dotenv()
 # Only load Supabase configuration from environment
 # Other API keys will be provided by users through the interface
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
\ No newline at end of file
+SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+
+# Worker threads that consume blocking Gemini streams, and how many chunks
+# each stream may buffer before its producer thread waits for the consumer
+LLM_STREAM_WORKERS = int(os.getenv("LLM_STREAM_WORKERS", "64"))
+LLM_STREAM_QUEUE_SIZE = int(os.getenv("LLM_STREAM_QUEUE_SIZE", "32"))
+
+# Initialized Gemini/Tavily clients are cached per API key (hashed) and shared
+# by every session that connects with the same key
+CLIENT_CACHE_SIZE = int(os.getenv("CLIENT_CACHE_SIZE", "256"))
+CLIENT_CACHE_TTL = float(os.getenv("CLIENT_CACHE_TTL", "3600"))
+
+# Web search result cache (entries per worker, default TTL in seconds) and the
+# time budget for a live Tavily lookup
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "4.0"))
+
+# Real-time questions (weather, news, prices, scores) start their web search at
+# end of turn, alongside the rest of the turn's setup; Gemini waits for the
+# results at most this many seconds after the search started
+SEARCH_PREFETCH_ENABLED = os.getenv("SEARCH_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_PREFETCH_BUDGET = float(os.getenv("SEARCH_PREFETCH_BUDGET", "1.5"))
+
+# Conversation memory: estimated tokens of raw history resent to Gemini each
+# turn before older turns are folded into a running summary
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "3000"))
+MEMORY_MIN_RECENT_TURNS = int(os.getenv("MEMORY_MIN_RECENT_TURNS", "2"))
+
+# Microphone audio is coalesced into packets of this many milliseconds before
+# going to AssemblyAI; at most AUDIO_MAX_BUFFER_MS is buffered if it stalls
+AUDIO_PACKET_MS = int(os.getenv("AUDIO_PACKET_MS", "50"))
+AUDIO_MAX_BUFFER_MS = int(os.getenv("AUDIO_MAX_BUFFER_MS", "2000"))
+
+# Optional server-side voice activity detection (needs numpy): silence beyond
+# VAD_HANGOVER_MS is not streamed to AssemblyAI, apart from a short packet of
+# digital silence every VAD_KEEPALIVE_MS
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false").lower() in ("1", "true", "yes")
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "1500"))
+VAD_KEEPALIVE_MS = int(os.getenv("VAD_KEEPALIVE_MS", "1000"))
+
+# Chats returned per page by the history list endpoints
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "20"))
+
+# Supabase calls run on a bounded thread pool; chat saves are batched for up
+# to CHAT_SAVE_FLUSH_MS and written with at most CHAT_SAVE_BATCH_SIZE rows per insert
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+CHAT_SAVE_BATCH_SIZE = int(os.getenv("CHAT_SAVE_BATCH_SIZE", "50"))
+CHAT_SAVE_FLUSH_MS = int(os.getenv("CHAT_SAVE_FLUSH_MS", "200"))
+
+# Appended conversation messages are folded into the conversation's
+# chat_history row each time this many more have accumulated
+CHAT_COMPACT_EVERY = int(os.getenv("CHAT_COMPACT_EVERY", "20"))
+
+# Synthesized audio of recurring sentences is cached (keyed by voice settings and
+# text) in memory and on disk, so repeated sentences skip Murf entirely. The
+# disk directory can be shared by several workers; TTS_CACHE_DISK_BYTES caps
+# the whole directory
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lelouch-tts-cache"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+# Besides fixed strings, a reply's opening sentence is cached when it is this
+# short (greetings, one-line answers); longer LLM text is never looked up
+TTS_CACHE_OPENING_MAX_CHARS = int(os.getenv("TTS_CACHE_OPENING_MAX_CHARS", "80"))
+
+# Opt-in speculative generation: Gemini starts on a stable partial transcript
+# and the result is kept if the final transcript has the same words (number
+# words and digits count as the same). With SPECULATIVE_FUZZY_MATCH it is also
+# kept when at least SPECULATIVE_MATCH_RATIO of the words match and no number
+# or negation changed
+SPECULATIVE_LLM_ENABLED = os.getenv("SPECULATIVE_LLM_ENABLED", "false").lower() in ("1", "true", "yes")
+SPECULATIVE_FUZZY_MATCH = os.getenv("SPECULATIVE_FUZZY_MATCH", "false").lower() in ("1", "true", "yes")
+SPECULATIVE_MATCH_RATIO = float(os.getenv("SPECULATIVE_MATCH_RATIO", "0.95"))
+
+# On barge-in, how long the interrupted turn gets to release its resources
+# before the next turn starts regardless
+BARGE_IN_GRACE_SECONDS = float(os.getenv("BARGE_IN_GRACE_SECONDS", "0.5"))
+
+# Admission control per worker (0 = unlimited): concurrent /ws sessions and
+# Gemini turns in flight. Sessions beyond the limit wait in a queue of at most
+# ADMISSION_QUEUE_SIZE for ADMISSION_QUEUE_TIMEOUT seconds; turns wait up to
+# TURN_QUEUE_TIMEOUT. On SIGTERM new work is refused and in-flight turns get
+# DRAIN_TIMEOUT_SECONDS to finish before the server shuts down.
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "200"))
+MAX_LLM_TURNS = int(os.getenv("MAX_LLM_TURNS", str(LLM_STREAM_WORKERS)))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+TURN_QUEUE_TIMEOUT = float(os.getenv("TURN_QUEUE_TIMEOUT", "10"))
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "25"))
+
+# Import the voice SDKs on a background thread once the server has started,
+# so the first voice session doesn't pay for them. Off by default on Vercel,
+# where an instance may only ever serve HTTP routes.
+PRELOAD_SDKS = os.getenv("PRELOAD_SDKS", "false" if os.getenv("VERCEL") else "true").lower() in ("1", "true", "yes")
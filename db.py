@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chat_history
+import config
+import metrics
+
+# supabase-py is synchronous; its calls run on this bounded pool so a slow
+# database round trip never blocks the event loop serving live voice sessions
+_executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="supabase")
+
+db_seconds = metrics.Histogram("voice_db_seconds", "Supabase call latency by operation.", ["operation"])
+chat_saves_coalesced = metrics.Counter("voice_chat_saves_coalesced_total", "Chat saves merged into a pending write.")
+chat_messages_appended = metrics.Counter("voice_chat_messages_appended_total", "Conversation messages appended.")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_supabase():
+    """The shared Supabase client, created on first use.
+
+    Importing supabase-py and building the client is a sizeable part of a cold
+    start, so it waits for the first request that touches the database. Called
+    from the Supabase pool, which keeps that first import off the event loop.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+                _client = create_client(config.SUPABASE_URL, config.SUPABASE_ANON_KEY)
+    return _client
+
+
+class _PendingSave:
+    def __init__(self, user_id: str, chat_data: list):
+        self.user_id = user_id
+        self.chat_data = chat_data
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class ChatStore:
+    """Async access to the ``chat_history`` table.
+
+    Reads and deletes run on the Supabase thread pool. Saves go through a
+    write-behind queue: they are collected for ``flush_interval`` seconds and
+    written with one batched insert, and a save of a conversation that is still
+    queued replaces the queued copy instead of adding another row. Each caller
+    still awaits the id of the row its conversation was written to.
+    Incremental appends (``append_messages``) share the same writer and are
+    batched into one upsert per flush. Every operation is called with the
+    Supabase client as its first argument, resolved on the pool.
+    """
+
+    def __init__(self, client_factory=get_supabase, batch_size: int = config.CHAT_SAVE_BATCH_SIZE,
+                 flush_interval: float = config.CHAT_SAVE_FLUSH_MS / 1000):
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}  # conversation key -> _PendingSave, in arrival order
+        self._pending_messages = {}  # (conversation_id, seq) -> chat_messages row
+        self._message_waiters = []
+        self._compaction_locks = {}
+        self._wakeup = None
+        self._writer = None
+
+    async def _run(self, operation: str, fn, *args):
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            return await loop.run_in_executor(_executor, lambda: fn(self.client_factory(), *args))
+        finally:
+            db_seconds.observe(time.monotonic() - start, operation)
+
+    async def list_chats(self, user_id: str, limit: int, cursor: str = None) -> dict:
+        return await self._run("list", chat_history.fetch_history_page, user_id, limit, cursor)
+
+    async def get_chat(self, chat_id: int):
+        return await self._run("get", chat_history.fetch_chat, chat_id)
+
+    async def delete_chat(self, chat_id: int):
+        return await self._run("delete", chat_history.delete_chat, chat_id)
+
+    async def save_chat(self, user_id: str, chat_data: list) -> int:
+        """Queue a save and return the id of the row it was written to."""
+        key = (user_id, _conversation_key(chat_data))
+        pending = self._pending.get(key)
+        if pending:
+            # Newer copy of a conversation that hasn't been written yet
+            pending.chat_data = chat_data
+            chat_saves_coalesced.inc()
+        else:
+            pending = self._pending[key] = _PendingSave(user_id, chat_data)
+        self._ensure_writer()
+        self._wakeup.set()
+        return await asyncio.shield(pending.future)
+
+    async def append_messages(self, conversation_id: str, user_id: str, start_seq: int, messages: list) -> int:
+        """Append messages at ``start_seq`` onward and return the next sequence number.
+
+        Retries are idempotent: a (conversation, seq) already stored or queued is
+        not written twice. Raises chat_history.ConversationNotFound when
+        ``start_seq`` is past 0 and the conversation has been deleted. Callers
+        fold the messages into the chat_history row with ``compact`` once
+        ``compaction_due`` says so.
+        """
+        if start_seq == 0:
+            await self._run("ensure", chat_history.ensure_conversation, conversation_id, user_id)
+        elif not await self._run("exists", chat_history.conversation_exists, conversation_id):
+            raise chat_history.ConversationNotFound(f"Conversation {conversation_id} does not exist")
+        if messages:
+            for offset, message in enumerate(messages):
+                seq = start_seq + offset
+                self._pending_messages[(conversation_id, seq)] = {
+                    'conversation_id': conversation_id, 'user_id': user_id, 'seq': seq, 'message': message,
+                }
+            waiter = asyncio.get_running_loop().create_future()
+            self._message_waiters.append(waiter)
+            self._ensure_writer()
+            self._wakeup.set()
+            await asyncio.shield(waiter)
+            chat_messages_appended.inc(amount=len(messages))
+        return start_seq + len(messages)
+
+    @staticmethod
+    def compaction_due(start_seq: int, next_seq: int) -> bool:
+        """True when an append crossed a multiple of CHAT_COMPACT_EVERY."""
+        every = config.CHAT_COMPACT_EVERY
+        return next_seq // every > start_seq // every
+
+    async def compact(self, conversation_id: str) -> int:
+        lock = self._compaction_locks.setdefault(conversation_id, asyncio.Lock())
+        try:
+            async with lock:
+                return await self._run("compact", chat_history.compact_conversation, conversation_id)
+        finally:
+            if not lock.locked():
+                self._compaction_locks.pop(conversation_id, None)
+
+    async def close(self):
+        """Write everything still queued and stop the writer."""
+        if self._writer and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        while self._pending or self._pending_messages:
+            await self._flush_batch()
+            await self._flush_messages()
+
+    def _ensure_writer(self):
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Let more saves arrive so they share one insert
+            await asyncio.sleep(self.flush_interval)
+            while self._pending or self._pending_messages:
+                await self._flush_batch()
+                await self._flush_messages()
+
+    async def _flush_messages(self):
+        rows = list(self._pending_messages.values())
+        waiters = self._message_waiters
+        self._pending_messages = {}
+        self._message_waiters = []
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                await self._run("append", chat_history.append_messages, rows[start:start + self.batch_size])
+            if rows:
+                logging.info(f"Appended {len(rows)} conversation message(s).")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        except Exception as e:
+            logging.error(f"Supabase message append error: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+
+    async def _flush_batch(self):
+        if not self._pending:
+            return
+        keys = list(self._pending)[:self.batch_size]
+        batch = [self._pending.pop(key) for key in keys]
+        rows = [{'user_id': save.user_id, 'chat_data': save.chat_data} for save in batch]
+
+        def insert(client):
+            return client.table('chat_history').insert(rows).execute()
+
+        try:
+            result = await self._run("insert", insert)
+            if len(result.data or []) != len(batch):
+                raise RuntimeError("No data returned from Supabase")
+            logging.info(f"Saved {len(batch)} chat(s) in one batch.")
+            for save, row in zip(batch, result.data):
+                if not save.future.done():
+                    save.future.set_result(row['id'])
+        except Exception as e:
+            logging.error(f"Supabase batch save error: {e}")
+            for save in batch:
+                if not save.future.done():
+                    save.future.set_exception(e)
+
+
+def _conversation_key(chat_data: list) -> str:
+    # A conversation is identified by when its first message was logged
+    first = chat_data[0] if isinstance(chat_data, list) and chat_data else None
+    if not isinstance(first, dict):
+        return repr(first)
+    return str(first.get('timestamp') or first.get('text', ''))
+
+
+chat_store = ChatStore()
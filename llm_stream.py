@@ -0,0 +1,115 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+
+# Dedicated pool so long-lived LLM streams can't starve the loop's default executor
+_executor = ThreadPoolExecutor(max_workers=config.LLM_STREAM_WORKERS, thread_name_prefix="llm-stream")
+
+# Worker threads currently consuming a stream; a cancelled turn should release its one promptly
+active_workers = metrics.Gauge("voice_llm_stream_workers_busy", "LLM stream worker threads in use.")
+
+_PUT_POLL_SECONDS = 0.25
+_DONE = object()
+
+
+class _StreamError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _cancel_rpc(source):
+    for target in (source, getattr(source, "_iterator", None)):
+        cancel = getattr(target, "cancel", None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception as e:
+                logging.debug(f"Cancelling LLM stream failed: {e}")
+            return
+
+
+class ThreadedStream:
+    """Async iterator over a blocking stream that is consumed on a worker thread.
+
+    ``open_stream`` is called on the worker thread and must return an iterable
+    (e.g. a Gemini ``send_message(..., stream=True)`` response). Items are handed
+    to the event loop through a bounded ``asyncio.Queue``, so a slow consumer
+    pauses the producer thread instead of buffering without limit. ``close()``
+    stops the producer and cancels the underlying RPC when it can.
+    """
+
+    def __init__(self, open_stream, maxsize: int = config.LLM_STREAM_QUEUE_SIZE):
+        self._open_stream = open_stream
+        self._queue = asyncio.Queue(maxsize)
+        self._stop = threading.Event()
+        self._future = None
+        self.source = None  # the underlying blocking stream, once opened
+
+    def start(self) -> "ThreadedStream":
+        loop = asyncio.get_running_loop()
+        self._future = loop.run_in_executor(_executor, self._produce, loop)
+        return self
+
+    def close(self):
+        """Stop the producer and cancel the underlying RPC so its thread is freed now.
+
+        Gemini streams wrap a gRPC call in ``_iterator``; cancelling it makes the
+        worker's blocking ``next()`` return immediately instead of after the next
+        chunk. Until the first chunk arrives there is no stream to cancel yet.
+        """
+        self._stop.set()
+        _cancel_rpc(self.source)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is _DONE:
+            raise StopAsyncIteration
+        if isinstance(item, _StreamError):
+            raise item.error
+        return item
+
+    def _put(self, item, loop) -> bool:
+        """Hand an item to the loop, blocking this thread while the queue is full."""
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._queue.put(item), loop)
+        except RuntimeError:  # event loop already closed
+            return False
+        while True:
+            try:
+                future.result(timeout=_PUT_POLL_SECONDS)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._stop.is_set():
+                    future.cancel()
+                    return False
+
+    def _produce(self, loop):
+        active_workers.inc()
+        try:
+            self._consume(loop)
+        finally:
+            active_workers.dec()
+
+    def _consume(self, loop):
+        try:
+            self.source = self._open_stream()
+            if self._stop.is_set():  # closed while the request was being opened
+                _cancel_rpc(self.source)
+                return
+            for item in self.source:
+                if self._stop.is_set() or not self._put(item, loop):
+                    logging.info("LLM stream consumer went away, stopping producer thread.")
+                    return
+        except Exception as e:
+            if not self._stop.is_set():
+                self._put(_StreamError(e), loop)
+            return
+        self._put(_DONE, loop)
@@ -4,36 +4,37 @@ import logging
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from fastapi.responses import PlainTextResponse
 from pathlib import Path as PathLib
 import json
 import asyncio
+import uuid
 import config
-from typing import Type, List
+import importlib
+import threading
+import time
+from typing import Type, TYPE_CHECKING
 import base64
-import websockets
 from datetime import datetime
-import re
-from tavily import TavilyClient
-from supabase import create_client, Client
-
-import assemblyai as aai
-from assemblyai.streaming.v3 import (
-    BeginEvent,
-    StreamingClient,
-    StreamingClientOptions,
-    StreamingError,
-    StreamingEvents,
-    StreamingParameters,
-    TerminationEvent,
-    TurnEvent,
-)
-import google.generativeai as genai
-
-# Global variables to store user API keys
-user_api_keys = {}
-
-# Initialize Supabase client
-supabase: Client = create_client(config.SUPABASE_URL, config.SUPABASE_ANON_KEY)
+from murf_tts import MurfStream
+from llm_stream import ThreadedStream
+from sessions import VoiceSession
+from speculation import Speculator
+from prefetch import SearchPrefetcher, with_search_results
+from turns import Turn, TurnScheduler
+from admission import admission, AdmissionRejected
+from segmenter import SentenceSegmenter
+from audio_frames import pack_audio_frame
+from tts_cache import CachedSpeech
+from audio_ingest import AudioIngest
+from vad import create_vad_gate
+import metrics
+from metrics import TurnTimeline
+import chat_history
+from db import chat_store
+
+if TYPE_CHECKING:
+    from assemblyai.streaming.v3 import BeginEvent, StreamingClient, StreamingError, TerminationEvent, TurnEvent
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 app = FastAPI()
@@ -42,175 +43,174 @@ BASE_DIR = PathLib(__file__).resolve().parent
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Initialize clients with user API keys (will be set when user provides keys)
-tavily_client = None
-gemini_model = None
+# Lelouch voice used for every Murf synthesis context
+MURF_VOICE_ID = "en-US-william"
+MURF_TTS_HINTS = {"pace": 0.92, "energy": 0.6, "pitch": -0.03}
+MURF_VOICE_CONFIG = {"voiceId": MURF_VOICE_ID, "style": "Conversational", **MURF_TTS_HINTS}
 
-def initialize_clients_with_keys(api_keys):
-    """Initialize API clients with user-provided keys"""
-    global tavily_client, gemini_model
-    
-    logging.info("Initializing AI clients with user API keys...")
-    
-    # Initialize Tavily client
-    if api_keys.get('tavily'):
-        try:
-            tavily_client = TavilyClient(api_key=api_keys['tavily'])
-            logging.info("✅ Tavily client initialized with user API key.")
-        except Exception as e:
-            logging.warning(f"Failed to initialize Tavily client: {e}")
-    else:
-        logging.info("No Tavily API key provided - web search will be disabled")
-    
-    # Initialize Gemini model
-    if api_keys.get('gemini'):
+# Fixed replies; spoken ones are kept in the TTS audio cache
+MODEL_UNAVAILABLE_TEXT = "I apologize, but my AI model is not properly initialized. Please check your API keys."
+TTS_UNAVAILABLE_TEXT = "I apologize, but the text-to-speech service is not configured properly."
+PROCESSING_ERROR_TEXT = "I apologize, but I encountered an issue processing that request."
+
+
+# SDKs a cold start shouldn't wait for: HTTP routes never need them, so they are
+# imported by the first voice session (or preloaded once the server is up)
+PRELOADED_SDKS = ("assemblyai.streaming.v3", "google.generativeai", "tavily", "supabase")
+
+
+def load_streaming_sdk():
+    """AssemblyAI's v3 streaming module, imported on first use. Blocking."""
+    from assemblyai.streaming import v3
+    return v3
+
+
+def preload_sdks():
+    start = time.monotonic()
+    for name in PRELOADED_SDKS:
         try:
-            logging.info("Configuring Gemini API...")
-            genai.configure(api_key=api_keys['gemini'])
-            
-            # Initialize simple Gemini model first
-            gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-            logging.info("✅ Gemini model initialized with user API key.")
+            importlib.import_module(name)
         except Exception as e:
-            logging.error(f"Failed to initialize Gemini model: {e}")
-            raise e
-    else:
-        logging.error("No Gemini API key provided!")
-        raise ValueError("Gemini API key is required")
-
-# Define search function for Gemini function calling
-def search_web(query: str) -> str:
-    """Search the web for current information using Tavily API"""
-    if not tavily_client:
-        return "I apologize, but my intelligence network is temporarily offline. However, I can still assist you with other matters using my vast knowledge and strategic insights."
-    
+            logging.warning(f"Could not preload {name}: {e}")
+    logging.info(f"Preloaded voice SDKs in {time.monotonic() - start:.2f}s.")
+
+
+async def speak_all(speech: CachedSpeech, text: str, cacheable: bool = False):
+    """Speak a complete (non-streamed) text sentence by sentence, then end the turn's speech.
+
+    ``cacheable`` is for fixed strings, whose audio is worth keeping in the TTS cache.
+    """
+    segmenter = SentenceSegmenter()
+    for sentence in segmenter.feed(text):
+        await speech.say(sentence, cacheable=cacheable)
+    await speech.say(segmenter.flush(), cacheable=cacheable)
+    await speech.finish()
+
+
+async def forward_speech(speech: CachedSpeech, client_websocket: WebSocket, session: VoiceSession, turn_id: int,
+                         timeline: TurnTimeline):
+    """Send a turn's audio to the browser as it is produced, then audio_end."""
+    first_audio_chunk_received = False
+    sequence = 0
     try:
-        response = tavily_client.search(query=query, max_results=3)
-        results = []
-        for result in response.get('results', []):
-            title = result.get('title', 'No title')
-            content = result.get('content', 'No content')[:300]  # Limit content length
-            url = result.get('url', 'No URL')
-            results.append(f"Title: {title}\nContent: {content}...\nSource: {url}")
-        
-        if results:
-            return "According to my intelligence network, here's what I found:\n\n" + "\n\n".join(results)
-        else:
-            return "My intelligence sources couldn't find relevant information for that query at this time."
+        async for audio_chunk in speech.audio():
+            if not first_audio_chunk_received:
+                await client_websocket.send_text(json.dumps({"type": "audio_start", "turn": turn_id}))
+                first_audio_chunk_received = True
+                timeline.mark("audio_start")
+                logging.info("✅ Streaming first audio chunk to client.")
+
+            if session.binary_audio:
+                # The browser gets raw bytes it can hand straight to the player
+                await client_websocket.send_bytes(pack_audio_frame(turn_id, sequence, audio_chunk))
+            else:
+                await client_websocket.send_text(
+                    json.dumps({"type": "audio", "data": base64.b64encode(audio_chunk).decode()})
+                )
+            sequence += 1
+
+        timeline.mark("audio_end")
+        logging.info(f"All sentences played ({speech.cached_sentences} from cache). Sending audio_end to client.")
+        await client_websocket.send_text(json.dumps({"type": "audio_end"}))
     except Exception as e:
-        logging.error(f"Web search error: {e}")
-        return "I encountered an issue accessing my intelligence network. My strategic database remains at your service for other inquiries."
+        logging.error(f"Error in Murf receiver task: {e}")
 
-# Gemini model will be initialized when user provides API keys
 
+async def speak_fixed_reply(text: str, client_websocket: WebSocket, session: VoiceSession, timeline: TurnTimeline):
+    """Speak a fixed string as the whole turn; after the first time its audio comes from the TTS cache."""
+    speech = CachedSpeech(session.tts_stream, f"voice-agent-context-{datetime.now().isoformat()}")
+    try:
+        receiver_task = asyncio.create_task(
+            forward_speech(speech, client_websocket, session, session.next_turn_id(), timeline)
+        )
+        await speak_all(speech, text, cacheable=True)
+        await asyncio.wait_for(receiver_task, timeout=60.0)
+    finally:
+        await speech.close()
+
+
+async def get_llm_response_stream(transcript: str, client_websocket: WebSocket, session: VoiceSession, timeline: TurnTimeline = None,
+                                  speculator: Speculator = None, turn: Turn = None, prefetcher: SearchPrefetcher = None):
+    timeline = timeline or TurnTimeline()
+    turn = turn or Turn()
+    gemini_model = session.gemini_model
+    tts_stream = session.tts_stream
+    memory = session.memory
 
-async def get_llm_response_stream(transcript: str, client_websocket: WebSocket, chat_history: List[dict]):
-    global user_api_keys, gemini_model
-    
     if not transcript or not transcript.strip():
         return
 
     if not gemini_model:
         logging.error("Cannot get LLM response because Gemini model is not initialized.")
-        await client_websocket.send_text(json.dumps({"type": "llm_chunk", "data": "I apologize, but my AI model is not properly initialized. Please check your API keys."}))
+        await client_websocket.send_text(json.dumps({"type": "llm_chunk", "data": MODEL_UNAVAILABLE_TEXT}))
+        if tts_stream:
+            await speak_fixed_reply(MODEL_UNAVAILABLE_TEXT, client_websocket, session, timeline)
         return
 
     logging.info(f"Sending to Gemini with history: '{transcript}'")
     logging.info(f"Gemini model status: {gemini_model is not None}")
-    logging.info(f"User API keys available: {list(user_api_keys.keys()) if user_api_keys else 'None'}")
+    logging.info(f"User API keys available: {list(session.api_keys.keys()) if session.api_keys else 'None'}")
     
-    murf_api_key = user_api_keys.get('murf', '')
-    if not murf_api_key:
+    if tts_stream is None:
         logging.error("Murf API key not provided")
-        await client_websocket.send_text(json.dumps({"type": "llm_chunk", "data": "I apologize, but the text-to-speech service is not configured properly."}))
+        await client_websocket.send_text(json.dumps({"type": "llm_chunk", "data": TTS_UNAVAILABLE_TEXT}))
         return
-    
-    murf_uri = f"wss://api.murf.ai/v1/speech/stream-input?api-key={murf_api_key}&sample_rate=44100&channel_type=MONO&format=MP3"
-
-    # Enhanced Lelouch persona with web search capability
-    voice_id = "en-US-william"
-    persona_prompt = (
-        "You are Lelouch vi Britannia, the exiled prince and brilliant strategist from Code Geass. "
-        "You have access to a search_web function for current information. "
-        "For questions about current events, weather, news, recent developments, or real-time information, "
-        "you MUST call the search_web function first to get accurate data. "
-        "Present search results as your 'strategic intelligence network' findings. "
-        "Use formal language and strategic thinking in your responses. "
-        f"User question: '{transcript}'"
-    )
-    tts_hints = {"pace": 0.92, "energy": 0.6, "pitch": -0.03}
 
     logging.info("Using enhanced Lelouch persona with web search capability")
-    logging.info(f"Voice: {voice_id}, TTS hints: {tts_hints}")
+    logging.info(f"Voice: {MURF_VOICE_ID}, TTS hints: {MURF_TTS_HINTS}")
 
+    context_id = f"voice-agent-context-{datetime.now().isoformat()}"
+    turn_id = session.next_turn_id()
+    outcome = "completed"
     try:
-        async with websockets.connect(murf_uri) as websocket:
-            logging.info(f"Successfully connected to Murf AI, using voice: {voice_id}")
-            context_id = f"voice-agent-context-{datetime.now().isoformat()}"
-            config_msg = {
-                "voice_config": {"voiceId": voice_id, "style": "Conversational", **tts_hints},
-                "context_id": context_id
-            }
-            await websocket.send(json.dumps(config_msg))
-
-            async def receive_and_forward_audio():
-                first_audio_chunk_received = False
-                while True:
-                    try:
-                        response_str = await websocket.recv()
-                        response = json.loads(response_str)
-
-                        if "audio" in response and response['audio']:
-                            if not first_audio_chunk_received:
-                                await client_websocket.send_text(json.dumps({"type": "audio_start"}))
-                                first_audio_chunk_received = True
-                                logging.info("✅ Streaming first audio chunk to client.")
-
-                            base_64_chunk = response['audio']
-                            await client_websocket.send_text(
-                                json.dumps({"type": "audio", "data": base_64_chunk})
-                            )
-
-                        if response.get("final"):
-                            logging.info("Murf confirms final audio chunk received. Sending audio_end to client.")
-                            await client_websocket.send_text(json.dumps({"type": "audio_end"}))
-                            break
-                    except websockets.ConnectionClosed:
-                        logging.warning("Murf connection closed unexpectedly.")
-                        await client_websocket.send_text(json.dumps({"type": "audio_end"}))
-                        break
-                    except Exception as e:
-                        logging.error(f"Error in Murf receiver task: {e}")
-                        break
-            receiver_task = asyncio.create_task(receive_and_forward_audio())
+        # Recurring sentences come from the audio cache; the rest stream into one shared Murf context
+        speech = CachedSpeech(tts_stream, context_id)
+        try:
+            # Real-time questions had their web search started at end of turn
+            search_results = await prefetcher.results_for(transcript) if prefetcher else None
+            if search_results:
+                timeline.mark("search")
+                if speculator:
+                    speculator.discard()  # it was started without the search results
+                gemini_response_stream = None
+            else:
+                gemini_response_stream = speculator.take(transcript) if speculator else None
+            prompt = with_search_results(transcript, search_results)
+            receiver_task = asyncio.create_task(forward_speech(speech, client_websocket, session, turn_id, timeline))
 
             try:
-                chat_history.append({"role": "user", "parts": [persona_prompt]})
-                chat = gemini_model.start_chat(history=chat_history[:-1])
+                # The persona is the model's system instruction; only raw turns go in history
+                chat = gemini_model.start_chat(history=memory.history())
 
                 def generate_with_function_calling():
                     try:
                         logging.info("Starting Gemini response generation...")
-                        response = chat.send_message(persona_prompt, stream=True)
+                        timeline.mark("llm_request")
+                        response = chat.send_message(prompt, stream=True)
                         return response
                     except Exception as e:
                         logging.error(f"Error in generation: {e}")
-                        return chat.send_message(persona_prompt, stream=True)
+                        return chat.send_message(prompt, stream=True)
 
-                loop = asyncio.get_running_loop()
-                gemini_response_stream = await loop.run_in_executor(None, generate_with_function_calling)
+                if gemini_response_stream:
+                    # Started on the partial transcript; its held-back chunks are released now
+                    timeline.mark("llm_request")
+                else:
+                    # Gemini's stream is blocking; iterate it on a worker thread so the loop stays free
+                    gemini_response_stream = ThreadedStream(generate_with_function_calling).start()
+                turn.llm_stream = gemini_response_stream
 
-                sentence_buffer = ""
+                segmenter = SentenceSegmenter()
                 full_response_text = ""
                 print("\n--- LELOUCH AI (GEMINI) STREAMING RESPONSE ---")
                 
                 # Handle both streaming and non-streaming responses
                 try:
-                    # For streaming responses, iterate directly
-                    sentence_buffer = ""
+                    # For streaming responses, iterate the async bridge
                     full_response_text = ""
                     
-                    for chunk in gemini_response_stream:
+                    async for chunk in gemini_response_stream:
+                        timeline.mark("llm_first_chunk")
                         if chunk.text:
                             print(chunk.text, end="", flush=True)
                             full_response_text += chunk.text
@@ -219,33 +219,21 @@ async def get_llm_response_stream(transcript: str, client_websocket: WebSocket,
                                 json.dumps({"type": "llm_chunk", "data": chunk.text})
                             )
                             
-                            sentence_buffer += chunk.text
-                            sentences = re.split(r'(?<=[.?!])\s+', sentence_buffer)
-                            
-                            if len(sentences) > 1:
-                                for sentence in sentences[:-1]:
-                                    if sentence.strip():
-                                        text_msg = {
-                                            "text": sentence.strip(), 
-                                            "end": False,
-                                            "context_id": context_id
-                                        }
-                                        await websocket.send(json.dumps(text_msg))
-                                sentence_buffer = sentences[-1]
-
-                    if sentence_buffer.strip():
-                        text_msg = {
-                            "text": sentence_buffer.strip(), 
-                            "end": True,
-                            "context_id": context_id
-                        }
-                        await websocket.send(json.dumps(text_msg))
+                            # Hand text to Murf as soon as the segmenter finds a speakable chunk
+                            for tts_chunk in segmenter.feed(chunk.text):
+                                timeline.mark("tts_first_text")
+                                await speech.say(tts_chunk)
+
+                    timeline.mark("tts_first_text")
+                    await speech.say(segmenter.flush())
+                    await speech.finish()
                         
                 except Exception as streaming_error:
                     logging.error(f"❌ Streaming error: {streaming_error}")
                     # Fallback: try to get the text directly
                     try:
-                        response_text = gemini_response_stream.text if hasattr(gemini_response_stream, 'text') else "I apologize, but I encountered an issue processing that request."
+                        source = gemini_response_stream.source
+                        response_text = source.text if hasattr(source, 'text') else PROCESSING_ERROR_TEXT
                         print(response_text)
                         full_response_text = response_text
                         
@@ -253,59 +241,64 @@ async def get_llm_response_stream(transcript: str, client_websocket: WebSocket,
                             json.dumps({"type": "llm_chunk", "data": response_text})
                         )
                         
-                        text_msg = {
-                            "text": response_text.strip(), 
-                            "end": True,
-                            "context_id": context_id
-                        }
-                        await websocket.send(json.dumps(text_msg))
+                        timeline.mark("tts_first_text")
+                        await speak_all(speech, response_text, cacheable=response_text == PROCESSING_ERROR_TEXT)
                     except Exception as fallback_error:
                         logging.error(f"❌ Fallback error: {fallback_error}")
-                        error_text = "I apologize, but I encountered an issue processing that request."
+                        error_text = PROCESSING_ERROR_TEXT
                         full_response_text = error_text
                         
                         await client_websocket.send_text(
                             json.dumps({"type": "llm_chunk", "data": error_text})
                         )
                         
-                        text_msg = {
-                            "text": error_text, 
-                            "end": True,
-                            "context_id": context_id
-                        }
-                        await websocket.send(json.dumps(text_msg))
+                        timeline.mark("tts_first_text")
+                        await speak_all(speech, error_text, cacheable=True)
                 
-                chat_history.append({"role": "model", "parts": [full_response_text]})
+                memory.add_turn(transcript, full_response_text)
+                memory.schedule_compaction()
 
                 print("\n--- END OF LELOUCH AI (GEMINI) STREAM ---\n")
+                turn.llm_finished()
                 logging.info("Finished streaming to Murf. Waiting for final audio chunks...")
 
                 await asyncio.wait_for(receiver_task, timeout=60.0)
                 logging.info("Receiver task finished gracefully.")
             
             finally:
+                if gemini_response_stream:
+                    gemini_response_stream.close()
                 if not receiver_task.done():
                     receiver_task.cancel()
                     logging.info("Receiver task cancelled on exit.")
+        finally:
+            await speech.close()
 
     except asyncio.CancelledError:
+        # The TurnScheduler has already told the client to stop playback
+        outcome = "cancelled"
         logging.info("LLM/TTS task was cancelled by user interruption.")
-        await client_websocket.send_text(json.dumps({"type": "audio_interrupt"}))
     except Exception as e:
+        outcome = "error"
         logging.error(f"Error in LLM/TTS streaming function: {e}", exc_info=True)
+    finally:
+        timeline.finish(outcome)
 
 
 @app.get("/auth")
 async def auth_page(request: Request):
-    return templates.TemplateResponse("auth.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "auth.html", {
         "supabase_url": config.SUPABASE_URL,
         "supabase_key": config.SUPABASE_ANON_KEY
     })
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 
 
@@ -320,93 +313,179 @@ async def save_chat(request: Request):
     
     try:
         logging.info(f"Attempting to save chat for user: {user_id}")
-        result = supabase.table('chat_history').insert({
-            'user_id': user_id,
-            'chat_data': chat_data
-        }).execute()
-        logging.info(f"Supabase result: {result}")
-        
-        if result.data:
-            return {"success": True, "id": result.data[0]['id']}
-        else:
-            logging.error(f"No data returned from Supabase")
-            return {"success": False, "message": "Failed to save to database"}
+        chat_id = await chat_store.save_chat(user_id, chat_data)
+        return {"success": True, "id": chat_id}
     except Exception as e:
         logging.error(f"Supabase save error: {e}")
         return {"success": False, "message": f"Database error: {str(e)}"}
 
+@app.post("/api/conversations/{conversation_id}/messages")
+async def append_conversation_messages(conversation_id: str, request: Request):
+    """Append new messages to a conversation, numbered from start_seq"""
+    data = await request.json()
+    user_id = data.get('user_id')
+    start_seq = data.get('start_seq')
+    messages = data.get('messages', [])
+
+    try:
+        conversation_id = str(uuid.UUID(conversation_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="conversation_id must be a UUID")
+    if not user_id or not isinstance(start_seq, int) or start_seq < 0 or not isinstance(messages, list):
+        raise HTTPException(status_code=400, detail="Missing user_id, start_seq or messages")
+
+    try:
+        next_seq = await chat_store.append_messages(conversation_id, user_id, start_seq, messages)
+    except chat_history.ConversationNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logging.error(f"Conversation append error: {e}")
+        return {"success": False, "message": f"Database error: {str(e)}"}
+
+    response = {"success": True, "next_seq": next_seq}
+    if chat_store.compaction_due(start_seq, next_seq):
+        # The messages are stored either way; a failed compaction is retried at the next boundary
+        try:
+            await chat_store.compact(conversation_id)
+        except chat_history.ConversationNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logging.error(f"Conversation compaction error: {e}")
+            response["compaction_error"] = f"Database error: {str(e)}"
+    return response
+
 @app.get("/api/chat-history/{user_id}")
-async def get_chat_history(user_id: str):
+async def get_chat_history(user_id: str, request: Request, limit: int = config.CHAT_HISTORY_PAGE_SIZE, cursor: str = None):
+    """Metadata-only, cursor-paginated list of a user's saved chats"""
+    limit = max(1, min(limit, chat_history.MAX_PAGE_SIZE))
     try:
-        result = supabase.table('chat_history').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
-        return {"success": True, "data": result.data}
+        page = await chat_store.list_chats(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Chat history error: {e}")
-        return {"success": True, "data": []}
+        page = {"data": [], "next_cursor": None}
+    return chat_history.conditional_json(request, {"success": True, **page})
+
+@app.get("/api/chat/{chat_id}")
+async def get_chat(chat_id: int, request: Request):
+    try:
+        chat = await chat_store.get_chat(chat_id)
+    except Exception as e:
+        logging.error(f"Chat fetch error: {e}")
+        return {"success": False, "message": str(e)}
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat_history.conditional_json(request, {"success": True, "data": chat})
 
 @app.delete("/api/delete-chat/{chat_id}")
 async def delete_chat(chat_id: int):
     try:
-        result = supabase.table('chat_history').delete().eq('id', chat_id).execute()
+        await chat_store.delete_chat(chat_id)
         return {"success": True}
     except Exception as e:
         logging.error(f"Delete chat error: {e}")
         return {"success": False, "message": str(e)}
 
+@app.on_event("startup")
+async def install_drain_handler():
+    admission.install_drain_on_sigterm()
+
+@app.on_event("startup")
+async def start_sdk_preload():
+    if config.PRELOAD_SDKS:
+        threading.Thread(target=preload_sdks, name="sdk-preload", daemon=True).start()
+
+@app.on_event("shutdown")
+async def flush_pending_writes():
+    await chat_store.close()
+
 async def send_client_message(ws: WebSocket, message: dict):
     try:
         await ws.send_text(json.dumps(message))
     except ConnectionError:
         logging.warning("Client connection closed, could not send message.")
 
+async def run_admitted_turn(turn: Turn, transcript: str, websocket: WebSocket, session: VoiceSession,
+                            timeline: TurnTimeline, speculator: Speculator = None, prefetcher: SearchPrefetcher = None):
+    """Run one voice turn once the worker has room for another LLM request."""
+    try:
+        async with admission.turn(lambda message: send_client_message(websocket, {"type": "status", "message": message})) as slot:
+            turn.llm_slot = slot
+            await get_llm_response_stream(transcript, websocket, session, timeline, speculator, turn, prefetcher)
+    except AdmissionRejected as e:
+        logging.warning(f"Turn rejected by admission control: {e}")
+        if speculator:
+            speculator.discard()
+        timeline.finish("rejected")
+        await send_client_message(websocket, {"type": "error", "message": str(e)})
+
 @app.websocket("/ws")
 async def websocket_audio_streaming(websocket: WebSocket):
     await websocket.accept()
     logging.info("WebSocket connection accepted.")
     main_loop = asyncio.get_running_loop()
     
-    llm_task = None
+    scheduler = TurnScheduler(websocket)
     last_processed_transcript = ""
-    chat_history = []
+    session = VoiceSession()
+    speculator = Speculator(session) if config.SPECULATIVE_LLM_ENABLED else None
+    prefetcher = SearchPrefetcher(session) if config.SEARCH_PREFETCH_ENABLED else None
     client = None
+    audio_ingest = None
     
-    # Wait for API keys from client
-    await send_client_message(websocket, {"type": "status", "message": "Waiting for API keys..."})
+    # Past the worker's session limit new arrivals queue (or are turned away)
+    # instead of slowing down everyone already connected
+    try:
+        await admission.admit_session(lambda message: send_client_message(websocket, {"type": "status", "message": message}))
+    except AdmissionRejected as e:
+        logging.warning(f"Session rejected by admission control: {e}")
+        await send_client_message(websocket, {"type": "error", "message": str(e)})
+        await websocket.close(code=1013)  # try again later
+        return
 
-    def on_turn(self: Type[StreamingClient], event: TurnEvent):
-        nonlocal last_processed_transcript, llm_task
+    def on_turn(self: Type["StreamingClient"], event: "TurnEvent"):
+        nonlocal last_processed_transcript
         transcript_text = event.transcript.strip()
+
+        # A real-time question gets its search started now, ahead of the formatted transcript
+        if prefetcher and event.end_of_turn and transcript_text != last_processed_transcript:
+            main_loop.call_soon_threadsafe(prefetcher.on_end_of_turn, transcript_text)
+
+        if speculator and not event.turn_is_formatted and transcript_text != last_processed_transcript:
+            # Speculating a search-backed answer would miss the search results
+            busy = scheduler.busy() or admission.turns_saturated() or (prefetcher and prefetcher.wants(transcript_text))
+            main_loop.call_soon_threadsafe(speculator.on_partial, transcript_text, event.end_of_turn, busy)
         
         if event.end_of_turn and event.turn_is_formatted and transcript_text and transcript_text != last_processed_transcript:
+            timeline = TurnTimeline()
             last_processed_transcript = transcript_text
             
-            if llm_task and not llm_task.done():
-                logging.warning("User interrupted while previous response was generating. Cancelling task.")
-                llm_task.cancel()
-                asyncio.run_coroutine_threadsafe(
-                    send_client_message(websocket, {"type": "audio_interrupt"}), main_loop
-                )
-            
             logging.info(f"Final formatted turn: '{transcript_text}'")
             
             transcript_message = { "type": "transcription", "text": transcript_text, "end_of_turn": True }
             asyncio.run_coroutine_threadsafe(send_client_message(websocket, transcript_message), main_loop)
             
             logging.info("Starting LLM response generation...")
-            llm_task = asyncio.run_coroutine_threadsafe(get_llm_response_stream(transcript_text, websocket, chat_history), main_loop)
+            # The scheduler interrupts any turn still speaking before starting this one
+            asyncio.run_coroutine_threadsafe(scheduler.start(
+                lambda turn: run_admitted_turn(turn, transcript_text, websocket, session, timeline, speculator, prefetcher)
+            ), main_loop)
             
         elif transcript_text and transcript_text == last_processed_transcript:
             logging.warning(f"Duplicate turn detected, ignoring: '{transcript_text}'")
 
-    def on_begin(self: Type[StreamingClient], event: BeginEvent): 
+    def on_begin(self: Type["StreamingClient"], event: "BeginEvent"): 
         logging.info("Transcription session started.")
-    def on_terminated(self: Type[StreamingClient], event: TerminationEvent): 
+    def on_terminated(self: Type["StreamingClient"], event: "TerminationEvent"): 
         logging.info("Transcription session terminated.")
-    def on_error(self: Type[StreamingClient], error: StreamingError): 
+    def on_error(self: Type["StreamingClient"], error: "StreamingError"): 
         logging.error(f"AssemblyAI streaming error: {error}")
 
+    metrics.active_sessions.inc()
     try:
-        pass  # Connection will be established when API keys are received
+        # Wait for API keys from client; connections are established when they arrive
+        await send_client_message(websocket, {"type": "status", "message": "Waiting for API keys..."})
 
         while True:
             try:
@@ -423,14 +502,13 @@ async def websocket_audio_streaming(websocket: WebSocket):
                     if data.get("type") == "ping":
                         await websocket.send_text(json.dumps({"type": "pong"}))
                     elif data.get("type") == "api_keys":
-                        # Store user API keys and initialize clients
-                        global user_api_keys
+                        # Store user API keys on this session and initialize its clients
                         user_api_keys = data.get("keys", {})
                         logging.info(f"Received API keys: {list(user_api_keys.keys())}")
+                        session.binary_audio = data.get("audio_transport") == "binary"
                         
                         # Validate required keys
-                        required_keys = ['gemini', 'assemblyai', 'murf']
-                        missing_keys = [key for key in required_keys if not user_api_keys.get(key)]
+                        missing_keys = session.missing_keys(user_api_keys)
                         
                         if missing_keys:
                             await send_client_message(websocket, {
@@ -441,7 +519,8 @@ async def websocket_audio_streaming(websocket: WebSocket):
                         
                         # Initialize clients with user keys
                         try:
-                            initialize_clients_with_keys(user_api_keys)
+                            # On a cold worker this imports the Gemini/Tavily SDKs; keep that off the loop
+                            await main_loop.run_in_executor(None, session.initialize_clients, user_api_keys)
                             logging.info("Successfully initialized AI clients with user API keys")
                         except Exception as e:
                             logging.error(f"Failed to initialize AI clients: {e}")
@@ -450,16 +529,26 @@ async def websocket_audio_streaming(websocket: WebSocket):
                                 "message": f"Failed to initialize AI services: {str(e)}"
                             })
                             continue
+
+                        # Open the session's Murf stream now so the first turn doesn't pay the handshake
+                        if session.tts_stream:
+                            await session.tts_stream.close()
+                        session.tts_stream = MurfStream(api_key=user_api_keys['murf'], voice_config=MURF_VOICE_CONFIG)
+                        session.tts_stream.start_warm_up()
                         
                         # Initialize AssemblyAI client
                         try:
-                            client = StreamingClient(StreamingClientOptions(api_key=user_api_keys['assemblyai']))
-                            client.on(StreamingEvents.Begin, on_begin)
-                            client.on(StreamingEvents.Turn, on_turn)
-                            client.on(StreamingEvents.Termination, on_terminated)
-                            client.on(StreamingEvents.Error, on_error)
+                            streaming = await main_loop.run_in_executor(None, load_streaming_sdk)
+                            client = streaming.StreamingClient(streaming.StreamingClientOptions(api_key=user_api_keys['assemblyai']))
+                            client.on(streaming.StreamingEvents.Begin, on_begin)
+                            client.on(streaming.StreamingEvents.Turn, on_turn)
+                            client.on(streaming.StreamingEvents.Termination, on_terminated)
+                            client.on(streaming.StreamingEvents.Error, on_error)
                             
-                            client.connect(StreamingParameters(sample_rate=16000, format_turns=True))
+                            client.connect(streaming.StreamingParameters(sample_rate=16000, format_turns=True))
+                            if audio_ingest:
+                                await main_loop.run_in_executor(None, audio_ingest.close)
+                            audio_ingest = AudioIngest(client.stream, gate=create_vad_gate()).start()
                             await send_client_message(websocket, {"type": "status", "message": "Connected to transcription service."})
                             logging.info("AssemblyAI client connected successfully")
                         except Exception as e:
@@ -468,16 +557,28 @@ async def websocket_audio_streaming(websocket: WebSocket):
                             continue
                 except (json.JSONDecodeError, TypeError): pass
             elif "bytes" in message:
-                if message['bytes'] and client:
-                    client.stream(message['bytes'])
+                if message['bytes'] and audio_ingest:
+                    # Never blocks: a sender thread packetizes and forwards to AssemblyAI
+                    audio_ingest.push(message['bytes'])
     except Exception as e:
         logging.error(f"WebSocket error: {e}", exc_info=True)
     finally:
-        if llm_task and not llm_task.done():
-            llm_task.cancel()
+        await scheduler.close()
         logging.info("Cleaning up connection resources.")
+        metrics.active_sessions.dec()
+        admission.release_session()
+        if audio_ingest:
+            await main_loop.run_in_executor(None, audio_ingest.close)
+            logging.info(f"Audio ingest stats: {audio_ingest.stats()}")
         if client:
             client.disconnect()
+        if speculator:
+            speculator.discard()
+        if prefetcher:
+            prefetcher.discard()
+        session.memory.close()
+        if session.tts_stream:
+            await session.tts_stream.close()
         if websocket.client_state.name != 'DISCONNECTED':
             await websocket.close()
 
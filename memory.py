@@ -0,0 +1,103 @@
+import asyncio
+import logging
+
+import config
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep names, facts, user preferences and open questions; drop small talk. "
+    "Reply with the summary only, under 150 words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New exchanges:\n{transcript}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+    return len(text) // 4 + 1
+
+
+class ConversationMemory:
+    """Rolling chat history for one session, kept within a token budget.
+
+    Only raw user/model text is stored; the persona lives in the model's system
+    instruction. ``history()`` returns the newest turns that fit the budget plus a
+    running summary of older ones, and ``schedule_compaction()`` folds old turns
+    into that summary on a background task so it never delays a response.
+    """
+
+    def __init__(self, summarize=None, token_budget: int = config.MEMORY_TOKEN_BUDGET,
+                 min_recent_turns: int = config.MEMORY_MIN_RECENT_TURNS):
+        self.summarize = summarize  # blocking callable: prompt -> summary text
+        self.token_budget = token_budget
+        self.min_recent_turns = min_recent_turns
+        self.summary = ""
+        self._turns = []  # (user_text, model_text, estimated_tokens)
+        self._compaction_task = None
+
+    def __len__(self):
+        return len(self._turns)
+
+    def add_turn(self, user_text: str, model_text: str):
+        tokens = estimate_tokens(user_text) + estimate_tokens(model_text)
+        self._turns.append((user_text, model_text, tokens))
+
+    def history(self) -> list:
+        """Gemini ``start_chat`` history: summary first, then the newest turns within budget."""
+        budget = self.token_budget - (estimate_tokens(self.summary) if self.summary else 0)
+        window = []
+        for user_text, model_text, tokens in reversed(self._turns):
+            if window and tokens > budget:
+                break
+            budget -= tokens
+            window.append((user_text, model_text))
+        window.reverse()
+
+        history = []
+        if self.summary:
+            history.append({"role": "user", "parts": [f"Summary of our conversation so far: {self.summary}"]})
+            history.append({"role": "model", "parts": ["Understood."]})
+        for user_text, model_text in window:
+            history.append({"role": "user", "parts": [user_text]})
+            history.append({"role": "model", "parts": [model_text]})
+        return history
+
+    def schedule_compaction(self):
+        """Start summarizing the oldest turns if raw history has outgrown the budget."""
+        if self.summarize is None or (self._compaction_task and not self._compaction_task.done()):
+            return
+        count = self._turns_to_compact()
+        if count:
+            self._compaction_task = asyncio.create_task(self._compact(count))
+
+    def close(self):
+        if self._compaction_task and not self._compaction_task.done():
+            self._compaction_task.cancel()
+
+    def _turns_to_compact(self) -> int:
+        total = sum(tokens for _, _, tokens in self._turns)
+        if total <= self.token_budget:
+            return 0
+        # Compact down to half the budget so we don't re-summarize after every turn
+        count = 0
+        while total > self.token_budget // 2 and len(self._turns) - count > self.min_recent_turns:
+            total -= self._turns[count][2]
+            count += 1
+        return count
+
+    async def _compact(self, count: int):
+        transcript = "\n".join(
+            f"User: {user_text}\nAssistant: {model_text}" for user_text, model_text, _ in self._turns[:count]
+        )
+        prompt = SUMMARY_PROMPT.format(summary=self.summary or "(none)", transcript=transcript)
+        loop = asyncio.get_running_loop()
+        try:
+            summary = await loop.run_in_executor(None, self.summarize, prompt)
+        except Exception as e:
+            logging.warning(f"Conversation summarization failed, keeping raw turns: {e}")
+            return
+
+        # Turns are only ever appended, so the summarized ones are still at the front
+        self.summary = summary.strip()
+        del self._turns[:count]
+        logging.info(f"Compacted {count} older turns into the conversation summary.")
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+# Latency buckets in seconds, tuned for voice turns (tens of ms up to a minute of audio)
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None) -> str:
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A counter, or one read at scrape time from a running total when ``function`` is given."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=(), function=None):
+        super().__init__(name, help_text, labelnames)
+        self._values = {} if self.labelnames else {(): 0.0}
+        self._function = function
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> list:
+        lines = self._header()
+        if self._function:
+            return lines + [f"{self.name} {self._function():g}"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value:g}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one computed at scrape time when ``function`` is given."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        super().__init__(name, help_text)
+        self._value = 0.0
+        self._function = function
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def render(self) -> list:
+        value = self._function() if self._function else self._value
+        return self._header() + [f"{self.name} {value:g}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = self._header()
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, labelvalues, ("le", f"{bound:g}"))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, labelvalues, ("le", "+Inf"))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {series[-2]:g}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+active_sessions = Gauge("voice_active_sessions", "Open /ws voice sessions on this worker.")
+turns_total = Counter("voice_turns_total", "Voice turns by outcome.", ["outcome"])
+barge_ins_total = Counter("voice_barge_ins_total", "Turns cancelled because the user interrupted.")
+turn_stage_seconds = Histogram(
+    "voice_turn_stage_seconds", "Time from the user's end of turn to each pipeline stage.", ["stage"]
+)
+search_seconds = Histogram("voice_search_seconds", "Web search latency by result.", ["result"])
+
+
+class TurnTimeline:
+    """Timestamps the stages of one voice turn, measured from the user's end of turn.
+
+    ``mark`` is thread-safe and keeps only the first occurrence of a stage, so it
+    can be called from chunk loops and worker threads alike. ``finish`` feeds the
+    offsets into ``voice_turn_stage_seconds`` and logs a one-line summary.
+    """
+
+    STAGES = ("search", "llm_request", "llm_first_chunk", "tts_first_text", "audio_start", "audio_end")
+
+    def __init__(self, start: float = None):
+        self.start = time.monotonic() if start is None else start
+        self.marks = {}
+        self._finished = False
+
+    def mark(self, stage: str):
+        if stage not in self.marks:
+            self.marks[stage] = time.monotonic() - self.start
+
+    def finish(self, outcome: str = "completed"):
+        if self._finished:
+            return
+        self._finished = True
+        turns_total.inc(outcome)
+        for stage, offset in self.marks.items():
+            turn_stage_seconds.observe(offset, stage)
+        summary = " ".join(f"{stage}=+{self.marks[stage] * 1000:.0f}ms" for stage in self.STAGES if stage in self.marks)
+        logging.info(f"Turn timeline ({outcome}): {summary}")
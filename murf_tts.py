@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+
+MURF_STREAM_URL = "wss://api.murf.ai/v1/speech/stream-input"
+
+# Idle time after which a turn pings the socket before reusing it
+HEALTH_CHECK_IDLE_SECONDS = 30.0
+HEALTH_CHECK_TIMEOUT = 5.0
+
+
+class MurfStream:
+    """A persistent Murf stream-input WebSocket shared by every turn of a /ws session.
+
+    The TLS + WebSocket handshake is paid once; each turn gets its own
+    ``context_id`` and an ``asyncio.Queue`` that receives Murf's responses
+    for that context. Dropped connections are re-established on the next send.
+    """
+
+    def __init__(self, api_key: str, voice_config: dict, sample_rate: int = 44100,
+                 channel_type: str = "MONO", audio_format: str = "MP3"):
+        self.api_key = api_key
+        self.voice_config = voice_config
+        self.sample_rate = sample_rate
+        self.channel_type = channel_type
+        self.audio_format = audio_format
+
+        self._ws = None
+        self._reader_task = None
+        self._warm_up_task = None
+        self._connect_lock = asyncio.Lock()
+        self._contexts = {}  # context_id -> asyncio.Queue of Murf responses
+        self._ended_contexts = set()  # contexts that already sent end=True
+        self._last_activity = 0.0
+
+    @property
+    def uri(self) -> str:
+        return (
+            f"{MURF_STREAM_URL}?api-key={self.api_key}&sample_rate={self.sample_rate}"
+            f"&channel_type={self.channel_type}&format={self.audio_format}"
+        )
+
+    def is_open(self) -> bool:
+        if self._ws is None:
+            return False
+        state = getattr(self._ws, "state", None)
+        return getattr(state, "name", None) == "OPEN"
+
+    async def connect(self):
+        """Open the socket if it is not already open. Safe to call concurrently."""
+        async with self._connect_lock:
+            if self.is_open():
+                return
+            self._ws = await websockets.connect(self.uri)
+            self._last_activity = time.monotonic()
+            self._reader_task = asyncio.create_task(self._read_loop(self._ws))
+            logging.info("✅ Connected to Murf AI (persistent session stream).")
+
+            # Re-bind contexts that were still streaming text when the previous socket dropped
+            for context_id in self._contexts:
+                if context_id not in self._ended_contexts:
+                    await self._ws.send(json.dumps(self._context_config(context_id)))
+
+    async def warm_up(self):
+        """Connect ahead of the first turn; a failure here is retried when the turn starts."""
+        try:
+            await self.connect()
+        except Exception as e:
+            logging.warning(f"Could not pre-connect to Murf AI: {e}")
+
+    def start_warm_up(self):
+        """Run ``warm_up`` in the background; ``close`` cancels it if it is still connecting."""
+        if self._warm_up_task is None or self._warm_up_task.done():
+            self._warm_up_task = asyncio.create_task(self.warm_up())
+
+    async def ensure_healthy(self):
+        """Ping an idle socket before a turn relies on it; reconnect if it is dead."""
+        if self.is_open() and time.monotonic() - self._last_activity > HEALTH_CHECK_IDLE_SECONDS:
+            try:
+                pong_waiter = await self._ws.ping()
+                await asyncio.wait_for(pong_waiter, timeout=HEALTH_CHECK_TIMEOUT)
+                self._last_activity = time.monotonic()
+            except Exception as e:
+                logging.warning(f"Murf health check failed, reconnecting: {e}")
+                await self._discard_connection()
+        await self.connect()
+
+    async def open_context(self, context_id: str) -> asyncio.Queue:
+        """Start a new synthesis context and return the queue its responses arrive on.
+
+        The queue yields Murf response dicts, or ``None`` if the connection was
+        lost after the context had already been ended.
+        """
+        await self.ensure_healthy()
+        queue = asyncio.Queue()
+        self._contexts[context_id] = queue
+        await self._send(self._context_config(context_id))
+        return queue
+
+    async def send_text(self, context_id: str, text: str, end: bool = False):
+        if end:
+            self._ended_contexts.add(context_id)
+        await self._send({"text": text, "end": end, "context_id": context_id})
+
+    async def clear_context(self, context_id: str):
+        """Ask Murf to drop whatever it still has queued for a context, then forget it."""
+        was_open = context_id in self._contexts
+        self.close_context(context_id)
+        if was_open and self.is_open():
+            try:
+                await self._ws.send(json.dumps({"context_id": context_id, "clear": True}))
+            except Exception as e:
+                logging.warning(f"Could not clear Murf context {context_id}: {e}")
+
+    def close_context(self, context_id: str):
+        self._contexts.pop(context_id, None)
+        self._ended_contexts.discard(context_id)
+
+    async def close(self):
+        # A warm-up still connecting must not reopen the socket after the session ended
+        warm_up_task, self._warm_up_task = self._warm_up_task, None
+        if warm_up_task and not warm_up_task.done():
+            warm_up_task.cancel()
+            await asyncio.gather(warm_up_task, return_exceptions=True)
+        for queue in self._contexts.values():
+            queue.put_nowait(None)
+        self._contexts.clear()
+        self._ended_contexts.clear()
+        await self._discard_connection()
+        logging.info("Murf session stream closed.")
+
+    def _context_config(self, context_id: str) -> dict:
+        return {"voice_config": self.voice_config, "context_id": context_id}
+
+    async def _send(self, message: dict):
+        payload = json.dumps(message)
+        for attempt in range(2):
+            if not self.is_open():
+                await self.connect()
+            try:
+                await self._ws.send(payload)
+                self._last_activity = time.monotonic()
+                return
+            except websockets.ConnectionClosed:
+                if attempt:
+                    raise
+                logging.warning("Murf connection closed while sending, reconnecting...")
+
+    async def _discard_connection(self):
+        ws, self._ws = self._ws, None
+        if self._reader_task and not self._reader_task.done():
+            self._reader_task.cancel()
+        self._reader_task = None
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    def _route(self, response_str):
+        """Hand one Murf message to its context's queue; malformed or unaddressed messages are dropped."""
+        try:
+            response = json.loads(response_str)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Dropping malformed Murf message: {e}")
+            return
+        if not isinstance(response, dict):
+            logging.warning(f"Dropping unexpected Murf message: {str(response)[:200]}")
+            return
+        context_id = response.get("context_id")
+        if not context_id:
+            # With several contexts open there is no safe guess where this belongs
+            logging.warning(f"Dropping Murf message without a context_id: {str(response)[:200]}")
+            return
+        queue = self._contexts.get(context_id)
+        if queue is not None:
+            queue.put_nowait(response)
+
+    async def _read_loop(self, ws):
+        try:
+            async for response_str in ws:
+                self._last_activity = time.monotonic()
+                try:
+                    self._route(response_str)
+                except Exception as e:
+                    logging.error(f"Error routing Murf message: {e}")
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logging.error(f"Error in Murf reader task: {e}")
+
+        if ws is self._ws:
+            logging.warning("Murf connection closed unexpectedly.")
+            # Forget the socket even if it still looks open, so the next send reconnects
+            self._ws, self._reader_task = None, None
+            try:
+                await ws.close()
+            except Exception:
+                pass
+            # Contexts that already sent end=True can never receive their final chunk now
+            for context_id in list(self._ended_contexts):
+                queue = self._contexts.get(context_id)
+                if queue is not None:
+                    queue.put_nowait(None)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import re
+import time
+
+import config
+import metrics
+from search import (
+    SEARCH_ERROR_MESSAGE,
+    SEARCH_NO_RESULTS_MESSAGE,
+    SEARCH_OFFLINE_MESSAGE,
+    normalize_query,
+    search_web_async,
+)
+
+# Topics that are only answerable with live data
+_REALTIME_TOPICS = re.compile(
+    r"\b(weather|forecast|temperature|humidity|news|headlines?|breaking news|stocks?|stock market|share price|"
+    r"bitcoin|crypto|exchange rate|scores?|who won|standings)\b"
+)
+# Topics that are just as often small talk or lore; they need a live-data cue as well
+_AMBIGUOUS_TOPICS = re.compile(
+    r"\b(rain|raining|snow|snowing|shares|market|results|election|prices?|cost of|happening)\b"
+)
+_LIVE_CUES = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|right now|currently|current|latest|live|"
+    r"this morning|this evening|this week|this weekend|so far|recent|recently)\b"
+)
+# Live data is only wanted for questions (or requests) about the world
+_QUESTION = re.compile(
+    r"^(?:(?:hey|ok|okay|so|well|lelouch|please)\s+)*"
+    r"(?:what|whats|who|whos|when|where|which|how|hows|is|are|was|were|will|did|does|do|can|could|"
+    r"should|has|have|any|tell me|give me|show me|check|look up|search|find)\b"
+)
+# Polite wrappers ("can you tell me") say nothing about whose weather is asked about
+_REQUEST_PHRASES = re.compile(
+    r"\b(?:(?:can|could|would|will) you (?:please )?)?(?:tell|give|show|let) me\b|\b(?:can|could|would) you\b"
+)
+# Questions about Lelouch, his world or the user are not searched
+_PERSONAL = re.compile(
+    r"\b(you|your|yours|yourself|i|me|my|mine|geass|britannia|britannian|black knights|suzaku|nunnally|zero requiem)\b"
+)
+_FAILED_RESULTS = {SEARCH_OFFLINE_MESSAGE, SEARCH_NO_RESULTS_MESSAGE, SEARCH_ERROR_MESSAGE}
+
+# Searches no turn is waiting for any more, kept alive until they have filled the cache
+_abandoned = set()
+
+search_prefetch_total = metrics.Counter(
+    "voice_search_prefetch_total", "Search prefetches by outcome (used, late, failed, unused).", ["result"]
+)
+search_prefetch_wait_seconds = metrics.Histogram(
+    "voice_search_prefetch_wait_seconds", "Time a turn waited on its search prefetch beyond the head start."
+)
+
+
+def is_realtime_query(transcript: str) -> bool:
+    """Cheap keyword classifier for questions that need a live web search.
+
+    A question (by its opening words or a question mark) that names a live-data
+    topic and is not about Lelouch, his world or the user. Topics such as rain
+    or results also need a cue like "today" or "latest".
+    """
+    # normalize_query drops "you", "me" and "lelouch" as filler, so work on the raw words
+    words = " ".join(re.sub(r"[^\w\s]", " ", transcript.lower().replace("'", "")).split())
+    if not (_QUESTION.search(words) or transcript.rstrip().endswith("?")):
+        return False
+    if _PERSONAL.search(_REQUEST_PHRASES.sub(" ", words)):
+        return False
+    if _REALTIME_TOPICS.search(words):
+        return True
+    return bool(_AMBIGUOUS_TOPICS.search(words)) and bool(_LIVE_CUES.search(words))
+
+
+def with_search_results(transcript: str, results: str) -> str:
+    """The message sent to Gemini when a prefetch made it in time."""
+    if not results:
+        return transcript
+    return (
+        f"{transcript}\n\n"
+        "[Live web search results for this question, fetched just now. Base your answer on them "
+        f"and present them as your intelligence network's findings.]\n{results}"
+    )
+
+
+class _Prefetch:
+    def __init__(self, query: str, tavily_client):
+        self.query = query
+        self.key = normalize_query(query)
+        self.started = time.monotonic()
+        # search_web_async gives up after SEARCH_TIMEOUT; the turn waits far less
+        self.task = asyncio.create_task(search_web_async(query, tavily_client))
+
+    def abandon(self):
+        if not self.task.done():
+            _abandoned.add(self.task)
+            self.task.add_done_callback(_abandoned.discard)
+
+
+class SearchPrefetcher:
+    """Runs the web search for real-time questions while the rest of the turn starts.
+
+    ``on_end_of_turn`` is fed the transcript as soon as AssemblyAI detects end
+    of turn (before the formatted transcript arrives) and again for the final
+    one. If the question looks like it needs live data, the search starts
+    right away. ``results_for`` is awaited by the turn just before it calls
+    Gemini: it returns the search results if they arrive within
+    SEARCH_PREFETCH_BUDGET seconds of the search starting, otherwise None so
+    the turn goes ahead without them. Late searches still fill the search
+    cache. Only used from the event loop.
+    """
+
+    def __init__(self, session, budget: float = config.SEARCH_PREFETCH_BUDGET):
+        self.session = session
+        self.budget = budget
+        self._current = None
+
+    def wants(self, transcript: str) -> bool:
+        return bool(self.session.tavily_client) and is_realtime_query(transcript)
+
+    def on_end_of_turn(self, transcript: str):
+        if not transcript or not self.wants(transcript):
+            return
+        key = normalize_query(transcript)
+        if self._current and self._current.key == key:
+            return  # the formatted transcript only changed punctuation or case
+        self.discard()
+        logging.info(f"Prefetching web search for real-time question: '{transcript}'")
+        self._current = _Prefetch(transcript, self.session.tavily_client)
+
+    async def results_for(self, transcript: str):
+        prefetch, self._current = self._current, None
+        if prefetch is None or prefetch.key != normalize_query(transcript):
+            if prefetch:
+                search_prefetch_total.inc("unused")
+                prefetch.abandon()
+            return None
+
+        remaining = self.budget - (time.monotonic() - prefetch.started)
+        waited_from = time.monotonic()
+        try:
+            done, _ = await asyncio.wait({prefetch.task}, timeout=max(0.0, remaining))
+        except asyncio.CancelledError:  # barge-in while waiting
+            prefetch.abandon()
+            raise
+        search_prefetch_wait_seconds.observe(time.monotonic() - waited_from)
+        if not done:
+            search_prefetch_total.inc("late")
+            prefetch.abandon()
+            logging.info(f"Search prefetch missed its {self.budget}s budget; answering without it.")
+            return None
+        results = prefetch.task.result()
+        if results in _FAILED_RESULTS:
+            search_prefetch_total.inc("failed")
+            return None
+        search_prefetch_total.inc("used")
+        logging.info(f"Search prefetch ready after {time.monotonic() - prefetch.started:.2f}s; adding it to the prompt.")
+        return results
+
+    def discard(self):
+        # The search itself is left to finish: its result lands in the search cache
+        if self._current:
+            search_prefetch_total.inc("unused")
+            self._current.abandon()
+            self._current = None
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import re
+import time
+
+import config
+import metrics
+from cache import TTLCache
+
+SEARCH_OFFLINE_MESSAGE = "I apologize, but my intelligence network is temporarily offline. However, I can still assist you with other matters using my vast knowledge and strategic insights."
+SEARCH_NO_RESULTS_MESSAGE = "My intelligence sources couldn't find relevant information for that query at this time."
+SEARCH_ERROR_MESSAGE = "I encountered an issue accessing my intelligence network. My strategic database remains at your service for other inquiries."
+
+# Fast-moving topics expire sooner than general knowledge lookups
+QUERY_CLASS_TTLS = {
+    "news": 300.0,
+    "weather": 600.0,
+    "general": config.SEARCH_CACHE_TTL,
+}
+_QUERY_CLASS_PATTERNS = {
+    "news": re.compile(r"\b(news|latest|breaking|today|tonight|score|scores|price|prices|stock|stocks)\b"),
+    "weather": re.compile(r"\b(weather|forecast|temperature|rain|snow|humid|humidity)\b"),
+}
+_FILLER_WORDS = {"please", "hey", "lelouch", "can", "you", "tell", "me"}
+
+search_cache = TTLCache(config.SEARCH_CACHE_SIZE, config.SEARCH_CACHE_TTL)
+metrics.Counter("voice_search_cache_hits_total", "Web search cache hits.", function=lambda: search_cache.hits)
+metrics.Counter("voice_search_cache_misses_total", "Web search cache misses.", function=lambda: search_cache.misses)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: lowercase, no punctuation or filler words, single spaces."""
+    words = re.sub(r"[^\w\s]", " ", query.lower().replace("'", "")).split()
+    kept = [word for word in words if word not in _FILLER_WORDS]
+    return " ".join(kept or words)
+
+
+def classify_query(normalized_query: str) -> str:
+    for query_class, pattern in _QUERY_CLASS_PATTERNS.items():
+        if pattern.search(normalized_query):
+            return query_class
+    return "general"
+
+
+def _format_results(response: dict) -> str:
+    results = []
+    for result in response.get('results', []):
+        title = result.get('title', 'No title')
+        content = result.get('content', 'No content')[:300]  # Limit content length
+        url = result.get('url', 'No URL')
+        results.append(f"Title: {title}\nContent: {content}...\nSource: {url}")
+
+    if results:
+        return "According to my intelligence network, here's what I found:\n\n" + "\n\n".join(results)
+    return SEARCH_NO_RESULTS_MESSAGE
+
+
+def _cached_result(cache_key: str):
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        logging.info(f"Search cache hit for '{cache_key}'")
+        metrics.search_seconds.observe(0.0, "hit")
+    return cached
+
+
+def _search_and_cache(query: str, cache_key: str, tavily_client) -> str:
+    started = time.monotonic()
+    try:
+        response = tavily_client.search(query=query, max_results=3)
+        result_text = _format_results(response)
+        search_cache.set(cache_key, result_text, ttl=QUERY_CLASS_TTLS[classify_query(cache_key)])
+        metrics.search_seconds.observe(time.monotonic() - started, "miss")
+        return result_text
+    except Exception as e:
+        logging.error(f"Web search error: {e}")
+        metrics.search_seconds.observe(time.monotonic() - started, "error")
+        return SEARCH_ERROR_MESSAGE
+
+
+# Define search function for Gemini function calling
+def search_web(query: str, tavily_client=None) -> str:
+    """Search the web for current information using Tavily API, served from cache when fresh"""
+    if not tavily_client:
+        return SEARCH_OFFLINE_MESSAGE
+
+    cache_key = normalize_query(query)
+    cached = _cached_result(cache_key)
+    if cached is not None:
+        return cached
+    return _search_and_cache(query, cache_key, tavily_client)
+
+
+async def search_web_async(query: str, tavily_client=None, timeout: float = config.SEARCH_TIMEOUT) -> str:
+    """``search_web`` for async callers: cache hits return inline, misses run on a
+    worker thread and give up after ``timeout`` seconds (the lookup still finishes
+    in the background and fills the cache for the next asker)."""
+    if not tavily_client:
+        return SEARCH_OFFLINE_MESSAGE
+
+    cache_key = normalize_query(query)
+    cached = _cached_result(cache_key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(None, _search_and_cache, query, cache_key, tavily_client), timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        logging.warning(f"Web search timed out after {timeout}s: '{query}'")
+        metrics.search_seconds.observe(timeout, "timeout")
+        return SEARCH_ERROR_MESSAGE
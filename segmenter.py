@@ -0,0 +1,114 @@
+import re
+
+_SENTENCE_END = ".?!…"
+# A sentence/clause mark plus any closing quotes or brackets that trail it
+_BOUNDARY = re.compile(r"[.?!…,;:—][\"')\]}”’]*")
+
+# Words that end in a period without ending the sentence
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "inc", "ltd",
+    "co", "corp", "dept", "approx", "no", "vol", "fig", "jan", "feb", "mar", "apr", "jun",
+    "jul", "aug", "sep", "sept", "oct", "nov", "dec", "e.g", "i.e", "a.m", "p.m", "u.s", "u.k",
+}
+
+FIRST_CHUNK_MIN_CHARS = 16
+FIRST_CHUNK_MAX_CHARS = 80
+CHUNK_MIN_CHARS = 60
+CHUNK_MAX_CHARS = 250
+
+
+class SentenceSegmenter:
+    """Incrementally splits streamed LLM text into chunks for text-to-speech.
+
+    The first chunk is flushed as early as possible, at a sentence end or at a
+    clause boundary once it has ``first_min_chars`` (or forcibly at
+    ``first_max_chars``), so audio can start before the opening sentence is
+    done. Later chunks group whole sentences up to ``chunk_min_chars`` for
+    smoother prosody and fewer TTS messages. Each ``feed`` only rescans the
+    unflushed tail, never the whole response.
+    """
+
+    def __init__(self, first_min_chars: int = FIRST_CHUNK_MIN_CHARS, first_max_chars: int = FIRST_CHUNK_MAX_CHARS,
+                 chunk_min_chars: int = CHUNK_MIN_CHARS, chunk_max_chars: int = CHUNK_MAX_CHARS):
+        self.first_min_chars = first_min_chars
+        self.first_max_chars = first_max_chars
+        self.chunk_min_chars = chunk_min_chars
+        self.chunk_max_chars = chunk_max_chars
+        self.chunks_emitted = 0
+        self._buffer = ""
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self._scan_pos = 0
+        self._sentence_cut = 0  # latest sentence boundary in the buffer
+        self._clause_cut = 0  # latest clause boundary in the buffer
+
+    def feed(self, text: str) -> list:
+        """Add streamed text and return any chunks that are ready to synthesize."""
+        self._buffer += text
+        chunks = []
+        while True:
+            cut = self._scan()
+            if not cut:
+                return chunks
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            self._reset_scan()
+            if chunk:
+                chunks.append(chunk)
+                self.chunks_emitted += 1
+
+    def flush(self) -> str:
+        """Return whatever text is left once the stream has ended."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        self._reset_scan()
+        if remainder:
+            self.chunks_emitted += 1
+        return remainder
+
+    def _scan(self) -> int:
+        """Scan new text from the last position; return a cut index or 0 to wait for more."""
+        buf = self._buffer
+        n = len(buf)
+        first = self.chunks_emitted == 0
+        max_chars = self.first_max_chars if first else self.chunk_max_chars
+
+        pos = self._scan_pos
+        while True:
+            match = _BOUNDARY.search(buf, pos)
+            if match is None or match.start() >= max_chars:
+                self._scan_pos = n if match is None else match.start()
+                break
+            i, j = match.start(), match.end()
+            if j >= n:
+                self._scan_pos = i  # can't tell yet whether whitespace follows
+                break
+            if buf[j].isspace():
+                if buf[i] in _SENTENCE_END:
+                    if self._ends_sentence(buf, i):
+                        self._sentence_cut = j
+                        if first or j >= self.chunk_min_chars:
+                            return j
+                else:
+                    self._clause_cut = j
+                    if first and j >= self.first_min_chars:
+                        return j
+            pos = j
+
+        if n >= max_chars:
+            # Too long to wait for a sentence end: cut at the best boundary we have
+            return self._sentence_cut or self._clause_cut or max(buf.rfind(" ", 0, max_chars), 0) or max_chars
+        return 0
+
+    @staticmethod
+    def _ends_sentence(buf: str, i: int) -> bool:
+        if buf[i] != ".":
+            return True
+        start = i
+        while start > 0 and (buf[start - 1].isalpha() or buf[start - 1] == "."):
+            start -= 1
+        word = buf[start:i]
+        if len(word) == 1 and word.isupper():
+            return False  # an initial, e.g. "J. K. Rowling"
+        return word.lower() not in ABBREVIATIONS
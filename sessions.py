@@ -0,0 +1,144 @@
+import hashlib
+import logging
+
+import config
+from cache import TTLCache
+from memory import ConversationMemory
+
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+REQUIRED_KEYS = ['gemini', 'assemblyai', 'murf']
+
+# Enhanced Lelouch persona with web search capability, sent once as the system instruction
+PERSONA_PROMPT = (
+    "You are Lelouch vi Britannia, the exiled prince and brilliant strategist from Code Geass. "
+    "You have access to a search_web function for current information. "
+    "For questions about current events, weather, news, recent developments, or real-time information, "
+    "you MUST call the search_web function first to get accurate data. "
+    "Present search results as your 'strategic intelligence network' findings. "
+    "Use formal language and strategic thinking in your responses."
+)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Cache key for an API key, so raw keys are never held as dictionary keys."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+# The Gemini and Tavily SDKs take most of a cold start to import, so they are
+# imported by the first session that needs them rather than with this module
+
+def _build_gemini_model(api_key: str):
+    import google.generativeai as genai
+    from google.ai import generativelanguage as glm
+    from google.api_core import client_options as client_options_lib
+
+    # genai.configure() is process-global; give each model its own client instead
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=PERSONA_PROMPT)
+    model._client = glm.GenerativeServiceClient(
+        client_options=client_options_lib.ClientOptions(api_key=api_key)
+    )
+    return model
+
+
+def _summarizer_for(persona_model):
+    import google.generativeai as genai
+
+    # A persona-free model sharing the persona model's client, for memory compaction
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    model._client = persona_model._client
+
+    def summarize(prompt: str) -> str:
+        return model.generate_content(prompt).text
+
+    return summarize
+
+
+def _build_tavily_client(api_key: str):
+    from tavily import TavilyClient
+    return TavilyClient(api_key=api_key)
+
+
+class ClientRegistry:
+    """LRU/TTL cache of initialized SDK clients keyed by a hash of the API key.
+
+    Repeat connections with the same keys reuse warm clients (and their HTTP/gRPC
+    channels) instead of constructing new ones on the connect path.
+    """
+
+    def __init__(self, maxsize: int = config.CLIENT_CACHE_SIZE, ttl: float = config.CLIENT_CACHE_TTL):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def _get_or_create(self, kind: str, api_key: str, factory):
+        cache_key = (kind, key_fingerprint(api_key))
+        client = self._cache.get(cache_key)
+        if client is None:
+            client = factory(api_key)
+            self._cache.set(cache_key, client)
+        else:
+            logging.info(f"Reusing cached {kind} client.")
+        return client
+
+    def gemini_model(self, api_key: str):
+        return self._get_or_create("gemini", api_key, _build_gemini_model)
+
+    def tavily_client(self, api_key: str):
+        return self._get_or_create("tavily", api_key, _build_tavily_client)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+client_registry = ClientRegistry()
+
+
+class VoiceSession:
+    """State owned by a single /ws connection: the user's keys, clients and conversation."""
+
+    def __init__(self, registry: ClientRegistry = client_registry):
+        self.registry = registry
+        self.api_keys = {}
+        self.gemini_model = None
+        self.tavily_client = None
+        self.tts_stream = None
+        self.memory = ConversationMemory()
+        self.binary_audio = False  # negotiated by the client in its api_keys message
+        self.turn_count = 0
+
+    def next_turn_id(self) -> int:
+        self.turn_count += 1
+        return self.turn_count & 0xFFFF
+
+    def missing_keys(self, api_keys: dict) -> list:
+        return [key for key in REQUIRED_KEYS if not api_keys.get(key)]
+
+    def initialize_clients(self, api_keys: dict):
+        """Attach clients for the user-provided keys to this session only.
+
+        Blocking: on a cold worker this imports the Gemini and Tavily SDKs, so
+        call it off the event loop.
+        """
+        self.api_keys = api_keys
+        logging.info("Initializing AI clients with user API keys...")
+
+        # Initialize Tavily client
+        if api_keys.get('tavily'):
+            try:
+                self.tavily_client = self.registry.tavily_client(api_keys['tavily'])
+                logging.info("✅ Tavily client initialized with user API key.")
+            except Exception as e:
+                logging.warning(f"Failed to initialize Tavily client: {e}")
+        else:
+            logging.info("No Tavily API key provided - web search will be disabled")
+
+        # Initialize Gemini model
+        if api_keys.get('gemini'):
+            try:
+                self.gemini_model = self.registry.gemini_model(api_keys['gemini'])
+                self.memory.summarize = _summarizer_for(self.gemini_model)
+                logging.info("✅ Gemini model initialized with user API key.")
+            except Exception as e:
+                logging.error(f"Failed to initialize Gemini model: {e}")
+                raise e
+        else:
+            logging.error("No Gemini API key provided!")
+            raise ValueError("Gemini API key is required")
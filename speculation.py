@@ -0,0 +1,176 @@
+import difflib
+import logging
+import re
+
+import config
+import metrics
+from llm_stream import ThreadedStream
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+_UNITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven",
+          "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_NUMBER_WORDS = {word: value for value, word in enumerate(_UNITS)}
+_NUMBER_WORDS.update({word: 20 + 10 * index for index, word in enumerate(_TENS)})
+_NEGATIONS = {
+    "no", "not", "never", "none", "nothing", "nobody", "nowhere", "neither", "nor", "without", "cannot",
+    "dont", "doesnt", "didnt", "isnt", "arent", "wasnt", "werent", "cant", "couldnt", "wont", "wouldnt",
+    "shouldnt", "mustnt", "havent", "hasnt", "hadnt", "aint",
+}
+
+speculative_turns_total = metrics.Counter(
+    "voice_speculative_turns_total", "Speculative LLM generations by result.", ["result"]
+)
+speculative_wasted_tokens_total = metrics.Counter(
+    "voice_speculative_wasted_tokens_total", "Estimated tokens generated by discarded speculations."
+)
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, punctuation-free form, so formatting alone never counts as a change."""
+    return " ".join(_NON_WORD.sub("", text.lower()).split())
+
+
+def transcript_tokens(text: str) -> list:
+    """Words of a normalized transcript, with number words up to 99 written as digits.
+
+    The formatted transcript turns "fifteen" into "15" and "twenty-five" into
+    "25"; both spellings give the same tokens.
+    """
+    tokens = []
+    after_tens_word = False
+    for word in normalize_transcript(text.replace("-", " ")).split():
+        value = _NUMBER_WORDS.get(word)
+        if value is None:
+            tokens.append(word)
+        elif after_tens_word and 0 < value < 10:
+            tokens[-1] = str(int(tokens[-1]) + value)
+        else:
+            tokens.append(str(value))
+        after_tens_word = word in _TENS
+    return tokens
+
+
+def _is_meaningful(token: str) -> bool:
+    return token in _NEGATIONS or any(char.isdigit() for char in token)
+
+
+def transcripts_match(final: str, speculated: str, fuzzy: bool = None, ratio: float = None) -> bool:
+    """Whether a generation started on ``speculated`` answers ``final``.
+
+    Only the same word tokens count by default. With ``fuzzy``, a token-level
+    similarity of at least ``ratio`` is also accepted, unless one of the
+    changed tokens is a number or a negation: those change the question.
+    """
+    fuzzy = config.SPECULATIVE_FUZZY_MATCH if fuzzy is None else fuzzy
+    ratio = config.SPECULATIVE_MATCH_RATIO if ratio is None else ratio
+    final_tokens, speculated_tokens = transcript_tokens(final), transcript_tokens(speculated)
+    if final_tokens == speculated_tokens:
+        return True
+    if not fuzzy:
+        return False
+    matcher = difflib.SequenceMatcher(None, final_tokens, speculated_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal" and any(map(_is_meaningful, final_tokens[i1:i2] + speculated_tokens[j1:j2])):
+            return False
+    return matcher.ratio() >= ratio
+
+
+class _CountingResponse:
+    """Wraps a Gemini streaming response and counts the characters it produced."""
+
+    def __init__(self, response):
+        self._response = response
+        self.chars = 0
+
+    def __iter__(self):
+        for chunk in self._response:
+            try:
+                self.chars += len(chunk.text or "")
+            except Exception:
+                pass
+            yield chunk
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _Speculation:
+    def __init__(self, session, transcript: str):
+        self.transcript = transcript
+        self.normalized = normalize_transcript(transcript)
+        self.response = None
+        chat = session.gemini_model.start_chat(history=session.memory.history())
+
+        def open_stream():
+            self.response = _CountingResponse(chat.send_message(transcript, stream=True))
+            return self.response
+
+        # Nothing reads the stream until the turn is committed, so at most
+        # LLM_STREAM_QUEUE_SIZE chunks are generated ahead of the final transcript
+        self.stream = ThreadedStream(open_stream).start()
+
+    def matches(self, transcript: str) -> bool:
+        return transcripts_match(transcript, self.transcript)
+
+    def discard(self):
+        self.stream.close()
+        wasted_chars = self.response.chars if self.response else 0
+        if wasted_chars:
+            # Same ~4 characters per token estimate as conversation memory
+            speculative_wasted_tokens_total.inc(amount=wasted_chars // 4 + 1)
+
+
+class Speculator:
+    """Starts Gemini on a stable partial transcript before the user's turn is final.
+
+    ``on_partial`` is fed every non-final transcript (and the unformatted
+    end-of-turn one). Once a transcript repeats unchanged, or end of turn is
+    detected, a held-back generation starts: its chunks wait in the stream's
+    queue and reach neither the client nor Murf. ``take`` is called with the
+    final formatted transcript and returns the stream if the speculation
+    matches it (see ``transcripts_match``), or discards it and returns None.
+    Only used from the event loop.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._current = None
+        self._last_partial = None
+
+    def on_partial(self, transcript: str, end_of_turn: bool, busy: bool):
+        normalized = normalize_transcript(transcript)
+        stable = end_of_turn or normalized == self._last_partial
+        self._last_partial = normalized
+        # Speculating during a response would be a barge-in built on stale history
+        if not normalized or not stable or busy or not self.session.gemini_model:
+            return
+        if self._current and self._current.normalized == normalized:
+            return
+        self.discard()
+        logging.info(f"Speculatively starting Gemini on partial transcript: '{transcript}'")
+        try:
+            self._current = _Speculation(self.session, transcript)
+        except Exception as e:
+            logging.warning(f"Could not start speculative generation: {e}")
+
+    def take(self, transcript: str):
+        speculation, self._current = self._current, None
+        self._last_partial = None
+        if speculation is None:
+            return None
+        if speculation.matches(transcript):
+            speculative_turns_total.inc("hit")
+            logging.info("Speculative generation matches the final transcript, committing it.")
+            return speculation.stream
+        speculative_turns_total.inc("miss")
+        logging.info(f"Speculation '{speculation.transcript}' does not match '{transcript}', discarding.")
+        speculation.discard()
+        return None
+
+    def discard(self):
+        if self._current:
+            speculative_turns_total.inc("discarded")
+            self._current.discard()
+            self._current = None
@@ -10,6 +10,11 @@ document.addEventListener("DOMContentLoaded", () => {
     let isPlaying = false;
     let currentAiMessageContentElement = null;
     let audioChunkIndex = 0;
+    let currentAudioTurn = null;
+
+    // Binary audio frames: version (u8) | kind (u8) | turn id (u16) | sequence (u32) | audio bytes
+    const AUDIO_FRAME_HEADER_SIZE = 8;
+    const AUDIO_FRAME_KIND_AUDIO = 1;
     
     // NEW: Keep a reference to the current audio source to stop it gracefully
     let currentAudioSource = null; 
@@ -151,6 +156,38 @@ document.addEventListener("DOMContentLoaded", () => {
             });
     };
 
+    const queueAudioChunk = (audioBuffer) => {
+        if (!audioBuffer || audioBuffer.byteLength === 0) {
+            console.warn("⚠️ Empty audio buffer, skipping...");
+            return;
+        }
+
+        console.log(`🎵 Lelouch AI: Processing audio chunk ${audioChunkIndex + 1}. Size: ${audioBuffer.byteLength} bytes. Queueing it up!`);
+        audioChunkIndex++;
+
+        audioQueue.push(audioBuffer);
+
+        if (!isPlaying) {
+            console.log(`▶️ Lelouch AI: Let's play the first chunk! I have ${audioQueue.length} pieces of my response ready.`);
+            playNextChunk();
+        }
+    };
+
+    const handleAudioFrame = (frame) => {
+        if (frame.byteLength < AUDIO_FRAME_HEADER_SIZE) {
+            console.warn("⚠️ Truncated audio frame, skipping...");
+            return;
+        }
+        const header = new DataView(frame, 0, AUDIO_FRAME_HEADER_SIZE);
+        if (header.getUint8(1) !== AUDIO_FRAME_KIND_AUDIO) return;
+
+        // Drop late frames from a turn that was interrupted
+        const turn = header.getUint16(2);
+        if (currentAudioTurn !== null && turn !== currentAudioTurn) return;
+
+        queueAudioChunk(frame.slice(AUDIO_FRAME_HEADER_SIZE));
+    };
+
     // API Key Management
     const showApiModal = () => {
         apiModal.classList.remove("hidden");
@@ -231,6 +268,15 @@ document.addEventListener("DOMContentLoaded", () => {
         return true;
     };
     
+    // Messages are appended to a server-side conversation; only unsaved ones are sent
+    let conversationId = crypto.randomUUID();
+    let savedSeq = 0;
+    
+    const startNewConversation = (existingId = null, alreadySaved = 0) => {
+        conversationId = existingId || crypto.randomUUID();
+        savedSeq = existingId ? alreadySaved : 0;
+    };
+    
     const saveChat = async () => {
         if (!currentUser || chatHistory.length === 0) {
             alert('No chat to save or user not logged in');
@@ -238,24 +284,36 @@ document.addEventListener("DOMContentLoaded", () => {
         }
         
         try {
-            console.log('Saving chat for user:', currentUser.id, 'Messages:', chatHistory.length);
-            const response = await fetch('/api/save-chat', {
+            const newMessages = chatHistory.slice(savedSeq);
+            console.log('Saving chat for user:', currentUser.id, 'New messages:', newMessages.length);
+            const response = await fetch(`/api/conversations/${conversationId}/messages`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     user_id: currentUser.id,
-                    chat_data: chatHistory
+                    start_seq: savedSeq,
+                    messages: newMessages
                 })
             });
             
             const result = await response.json();
             console.log('Save result:', result);
             
-            if (response.ok) {
+            if (response.status === 404) {
+                // The conversation was deleted from another tab; save this chat as a new one
+                startNewConversation();
+                return saveChat();
+            }
+            if (response.ok && result.success) {
+                savedSeq = result.next_seq;
+                if (result.compaction_error) {
+                    console.warn('Messages saved, compaction deferred:', result.compaction_error);
+                }
                 alert(result.message || 'Chat saved successfully!');
                 loadSidebarHistory(); // Refresh sidebar
             } else {
-                alert('Failed to save chat: ' + result.detail);
+                // savedSeq is unchanged, so retrying resends the same messages safely
+                alert('Failed to save chat: ' + (result.detail || result.message));
             }
         } catch (error) {
             console.error('Error saving chat:', error);
@@ -275,23 +333,30 @@ document.addEventListener("DOMContentLoaded", () => {
         sidebarOverlay.classList.add('hidden');
     };
     
-    const loadSidebarHistory = async () => {
+    let sidebarNextCursor = null;
+
+    const loadSidebarHistory = async (append = false) => {
         if (!currentUser) return;
         
-        sidebarLoading.classList.remove('hidden');
-        sidebarHistory.classList.add('hidden');
-        sidebarEmpty.classList.add('hidden');
+        if (!append) {
+            sidebarLoading.classList.remove('hidden');
+            sidebarHistory.classList.add('hidden');
+            sidebarEmpty.classList.add('hidden');
+        }
         
         try {
             console.log('Loading history for user:', currentUser.id);
-            const response = await fetch(`/api/chat-history/${currentUser.id}`);
+            // Metadata only; a chat's messages are fetched when it is opened
+            const params = append && sidebarNextCursor ? `?cursor=${encodeURIComponent(sidebarNextCursor)}` : '';
+            const response = await fetch(`/api/chat-history/${currentUser.id}${params}`);
             const result = await response.json();
             console.log('History result:', result);
             
             sidebarLoading.classList.add('hidden');
             
-            if (result.success && result.data.length > 0) {
-                displaySidebarHistory(result.data);
+            if (result.success && (append || result.data.length > 0)) {
+                sidebarNextCursor = result.next_cursor || null;
+                displaySidebarHistory(result.data, append);
                 sidebarHistory.classList.remove('hidden');
             } else {
                 console.log('No history found or empty data');
@@ -304,20 +369,21 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     };
     
-    const displaySidebarHistory = (chatData) => {
-        sidebarHistory.innerHTML = '';
+    const displaySidebarHistory = (chats, append = false) => {
+        if (!append) sidebarHistory.innerHTML = '';
+        const loadMoreBtn = document.getElementById('sidebarLoadMore');
+        if (loadMoreBtn) loadMoreBtn.remove();
         
-        chatData.forEach((chat, index) => {
-            const firstUserMessage = chat.chat_data.find(msg => msg.sender === 'user');
-            const preview = firstUserMessage ? firstUserMessage.text.substring(0, 40) + '...' : 'Chat';
+        chats.forEach((chat) => {
+            const preview = chat.preview ? chat.preview.substring(0, 40) + '...' : 'Chat';
             const date = new Date(chat.created_at).toLocaleDateString();
             
             const chatItem = document.createElement('div');
             chatItem.className = 'p-3 rounded hover:bg-gray-700 transition-colors flex justify-between items-center';
             chatItem.innerHTML = `
-                <div class="flex-1 cursor-pointer" onclick="loadChatFromHistory(${JSON.stringify(chat.chat_data).replace(/"/g, '&quot;')})">
+                <div class="flex-1 cursor-pointer" onclick="openChatFromHistory(${chat.id})">
                     <div class="text-xs md:text-sm font-medium" style="color: #EEEEEE;">${preview}</div>
-                    <div class="text-xs" style="color: #888;">${date} • ${chat.chat_data.length} msgs</div>
+                    <div class="text-xs" style="color: #888;">${date} • ${chat.message_count} msgs</div>
                 </div>
                 <button onclick="deleteChat(${chat.id})" class="text-red-400 hover:text-red-300 p-1 text-sm">
                     🗑️
@@ -326,6 +392,30 @@ document.addEventListener("DOMContentLoaded", () => {
             
             sidebarHistory.appendChild(chatItem);
         });
+        
+        if (sidebarNextCursor) {
+            const moreBtn = document.createElement('button');
+            moreBtn.id = 'sidebarLoadMore';
+            moreBtn.className = 'w-full p-2 text-xs rounded hover:bg-gray-700 transition-colors';
+            moreBtn.style.color = '#00ADB5';
+            moreBtn.textContent = 'Load more';
+            moreBtn.addEventListener('click', () => loadSidebarHistory(true));
+            sidebarHistory.appendChild(moreBtn);
+        }
+    };
+    
+    const openChatFromHistory = async (chatId) => {
+        try {
+            const response = await fetch(`/api/chat/${chatId}`);
+            const result = await response.json();
+            if (result.success) {
+                loadChatFromHistory(result.data.chat_data);
+                // Continuing a saved conversation appends to it instead of saving a copy
+                startNewConversation(result.data.conversation_id, result.data.chat_data.length);
+            }
+        } catch (error) {
+            console.error('Error loading chat:', error);
+        }
     };
     
     const deleteChat = async (chatId) => {
@@ -344,6 +434,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const loadChatFromHistory = (chatData) => {
         chatContainer.innerHTML = '';
         chatHistory = [];
+        startNewConversation();
         
         chatData.forEach(msg => {
             addToChatLog(msg.text, msg.sender);
@@ -356,6 +447,7 @@ document.addEventListener("DOMContentLoaded", () => {
     // Make functions globally accessible
     window.deleteChat = deleteChat;
     window.loadChatFromHistory = loadChatFromHistory;
+    window.openChatFromHistory = openChatFromHistory;
     
     // Event listeners
     logoutBtn.addEventListener('click', async () => {
@@ -510,6 +602,7 @@ document.addEventListener("DOMContentLoaded", () => {
             // Create WebSocket with connection timeout
             const wsProtocol = window.location.protocol === "https:" ? "wss:" : "ws:";
             socket = new WebSocket(`${wsProtocol}//${window.location.host}/ws`);
+            socket.binaryType = "arraybuffer";
             
             // Set connection timeout
             const connectionTimeout = setTimeout(() => {
@@ -527,7 +620,8 @@ document.addEventListener("DOMContentLoaded", () => {
                 // Send API keys to server
                 socket.send(JSON.stringify({
                     type: "api_keys",
-                    keys: apiKeys
+                    keys: apiKeys,
+                    audio_transport: "binary"
                 }));
                 
                 // Set up heartbeat
@@ -587,6 +681,10 @@ document.addEventListener("DOMContentLoaded", () => {
             };
 
             socket.onmessage = (event) => {
+                if (event.data instanceof ArrayBuffer) {
+                    handleAudioFrame(event.data);
+                    return;
+                }
                 try {
                     const data = JSON.parse(event.data);
                     
@@ -632,43 +730,23 @@ document.addEventListener("DOMContentLoaded", () => {
                             
                             audioQueue = [];
                             audioChunkIndex = 0;
+                            currentAudioTurn = data.turn ?? null;
                             break;
                         case "audio_interrupt":
                             stopCurrentPlayback();
+                            currentAudioTurn = -1; // ignore frames still in flight for the interrupted turn
                             statusDisplay.textContent = "Interrupted. Listening...";
                             break;
                         case "audio": {
                             if (data.data) {
                                 try {
+                                    // Fallback for servers that still send base64-in-JSON audio
                                     const audioData = atob(data.data);
-                                    
-                                    // Validate base64 decoded data
-                                    if (!audioData || audioData.length === 0) {
-                                        console.warn("⚠️ Empty audio data received, skipping...");
-                                        break;
-                                    }
-                                    
-                                    const byteNumbers = new Array(audioData.length);
+                                    const byteArray = new Uint8Array(audioData.length);
                                     for (let i = 0; i < audioData.length; i++) {
-                                        byteNumbers[i] = audioData.charCodeAt(i);
-                                    }
-                                    const byteArray = new Uint8Array(byteNumbers);
-                                    
-                                    // Validate the resulting buffer
-                                    if (byteArray.buffer.byteLength === 0) {
-                                        console.warn("⚠️ Empty audio buffer, skipping...");
-                                        break;
-                                    }
-                                    
-                                    console.log(`🎵 Lelouch AI: Processing audio chunk ${audioChunkIndex + 1}. Size: ${byteArray.buffer.byteLength} bytes. Queueing it up!`);
-                                    audioChunkIndex++;
-                                    
-                                    audioQueue.push(byteArray.buffer);
-                                    
-                                    if (!isPlaying) {
-                                        console.log(`▶️ Lelouch AI: Let's play the first chunk! I have ${audioQueue.length} pieces of my response ready.`);
-                                        playNextChunk();
+                                        byteArray[i] = audioData.charCodeAt(i);
                                     }
+                                    queueAudioChunk(byteArray.buffer);
                                 } catch (error) {
                                     console.error("Error processing audio chunk:", error);
                                     console.warn("Skipping corrupted audio chunk...");
@@ -837,6 +915,7 @@ document.addEventListener("DOMContentLoaded", () => {
     clearBtn.addEventListener("click", () => {
         chatContainer.innerHTML = '';
         chatHistory = [];
+        startNewConversation();
         clearBtnContainer.classList.add("hidden");
         updateMessageCount();
     });
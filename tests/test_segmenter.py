@@ -0,0 +1,92 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import FIRST_CHUNK_MAX_CHARS, SentenceSegmenter  # noqa: E402
+
+
+def segment(text, step=None, **kwargs):
+    """Feed ``text`` whole (or ``step`` characters at a time); return (chunks, flushed remainder)."""
+    segmenter = SentenceSegmenter(**kwargs)
+    chunks = []
+    if step is None:
+        chunks += segmenter.feed(text)
+    else:
+        for start in range(0, len(text), step):
+            chunks += segmenter.feed(text[start:start + step])
+    return chunks, segmenter.flush()
+
+
+def test_abbreviations_do_not_end_sentences():
+    chunks, rest = segment("Dr. Smith flew to the U.S. embassy yesterday. It was closed.")
+    assert chunks == ["Dr. Smith flew to the U.S. embassy yesterday."]
+    assert rest == "It was closed."
+
+
+def test_decimals_and_initials_do_not_end_sentences():
+    chunks, rest = segment("The price rose 3.5 percent today. J. K. Rowling agreed.")
+    assert chunks == ["The price rose 3.5 percent today."]
+    assert rest == "J. K. Rowling agreed."
+
+
+def test_first_chunk_cuts_at_a_clause_once_long_enough():
+    chunks, rest = segment("Well, my dear friend, the board is set and every piece is in motion now")
+    # "Well," is shorter than first_min_chars, so the first cut waits for the next comma
+    assert chunks == ["Well, my dear friend,"]
+    assert rest == "the board is set and every piece is in motion now"
+
+
+def test_first_chunk_is_cut_at_max_chars_without_any_boundary():
+    chunks, rest = segment("a" * 100)
+    assert chunks == ["a" * FIRST_CHUNK_MAX_CHARS]
+    assert rest == "a" * (100 - FIRST_CHUNK_MAX_CHARS)
+
+
+def test_long_first_sentence_is_cut_at_a_space_before_max_chars():
+    text = "word " * 30
+    chunks, _ = segment(text)
+    assert chunks[0] == ("word " * 16).strip()
+    assert len(chunks[0]) <= FIRST_CHUNK_MAX_CHARS
+
+
+def test_later_chunks_group_sentences_up_to_min_chars():
+    text = ("Hello there. This is the second sentence of the reply and it goes on. Short one. "
+            "Another sentence that is long enough to pass the minimum on its own.")
+    chunks, rest = segment(text)
+    assert chunks == [
+        "Hello there.",
+        "This is the second sentence of the reply and it goes on. Short one.",
+    ]
+    assert rest == "Another sentence that is long enough to pass the minimum on its own."
+
+
+def test_token_by_token_feeding_matches_feeding_at_once():
+    text = ("Dr. Smith arrived at 3.5 p.m. sharp. The U.S. delegation, however, was late, "
+            "and nobody knew why. J. K. Rowling sent her regards! Was the meeting a success? It was.")
+    whole = segment(text)
+    for step in (1, 2, 3, 7):
+        assert segment(text, step=step) == whole
+
+
+def test_boundary_at_end_of_fed_text_waits_for_the_next_token():
+    segmenter = SentenceSegmenter()
+    # "Dr." could still turn out to be the end of a sentence or an abbreviation
+    assert segmenter.feed("I spoke to Dr.") == []
+    assert segmenter.feed(" Smith today. He") == ["I spoke to Dr. Smith today."]
+    assert segmenter.flush() == "He"
+
+
+def test_flush_returns_remainder_once_and_resets():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("An unfinished thought") == []
+    assert segmenter.flush() == "An unfinished thought"
+    assert segmenter.flush() == ""
+    assert segmenter.chunks_emitted == 1
+
+
+def test_flush_of_whitespace_only_emits_nothing():
+    segmenter = SentenceSegmenter()
+    segmenter.feed("   ")
+    assert segmenter.flush() == ""
+    assert segmenter.chunks_emitted == 0
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speculation import _Speculation, transcript_tokens, transcripts_match  # noqa: E402
+
+
+def speculation_on(transcript):
+    # matches() only reads the transcript; skip starting a Gemini stream
+    speculation = _Speculation.__new__(_Speculation)
+    speculation.transcript = transcript
+    return speculation
+
+
+def test_formatting_only_changes_match():
+    assert transcripts_match("What's the weather in Tokyo?", "whats the weather in tokyo")
+    assert transcripts_match("Set a timer for 15 minutes.", "set a timer for fifteen minutes")
+    assert transcripts_match("Call me in 25 minutes", "call me in twenty-five minutes")
+    assert transcripts_match("Call me in 25 minutes", "call me in twenty five minutes")
+
+
+def test_number_words_become_digits():
+    assert transcript_tokens("Twenty five, fifteen and forty") == ["25", "15", "and", "40"]
+    assert transcript_tokens("one two") == ["1", "2"]
+
+
+def test_negation_edit_never_matches():
+    final = "I don't want you to send the message to my brother"
+    speculated = "I do want you to send the message to my brother"
+    assert not transcripts_match(final, speculated)
+    assert not transcripts_match(final, speculated, fuzzy=True, ratio=0.5)
+    assert not transcripts_match("Is it not raining in Paris", "is it raining in paris", fuzzy=True, ratio=0.5)
+
+
+def test_number_edit_never_matches():
+    assert not transcripts_match("Set a timer for 15 minutes", "set a timer for 50 minutes")
+    assert not transcripts_match("Set a timer for 15 minutes", "set a timer for fifty minutes", fuzzy=True, ratio=0.5)
+    assert not transcripts_match("Set a timer for 15 minutes", "set a timer for minutes", fuzzy=True, ratio=0.5)
+
+
+def test_word_edits_need_fuzzy_matching():
+    final = "Tell me about the history of the Roman empire and its emperors"
+    speculated = "tell me about the history of the roman empire and his emperors"
+    assert not transcripts_match(final, speculated)
+    assert transcripts_match(final, speculated, fuzzy=True, ratio=0.9)
+    assert not transcripts_match(final, speculated, fuzzy=True, ratio=0.95)
+
+
+def test_speculation_matches_exact_tokens_by_default():
+    speculation = speculation_on("set a timer for fifteen minutes")
+    assert speculation.matches("Set a timer for 15 minutes.")
+    assert not speculation.matches("Set a timer for 50 minutes.")
+    assert not speculation.matches("Set a timer for fifteen seconds.")
+    assert not speculation_on("i do want you to send the message to my brother").matches(
+        "I don't want you to send the message to my brother."
+    )
@@ -0,0 +1,353 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+
+_CHUNK_LENGTH = struct.Struct("!I")
+# The directory is rescanned after this many writes, to pick up other workers' entries
+_RESCAN_EVERY = 100
+
+# Disk lookups get their own small pool: the default executor also runs web
+# searches and summaries, and a sentence must never queue behind those
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-cache")
+
+_background_writes = set()
+
+tts_cache_lookups = metrics.Counter("voice_tts_cache_lookups_total", "TTS audio cache lookups by result.", ["result"])
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _pack_chunks(chunks) -> bytes:
+    return b"".join(_CHUNK_LENGTH.pack(len(chunk)) + chunk for chunk in chunks)
+
+
+def _unpack_chunks(blob: bytes) -> tuple:
+    chunks = []
+    offset = 0
+    while offset < len(blob):
+        (length,) = _CHUNK_LENGTH.unpack_from(blob, offset)
+        offset += _CHUNK_LENGTH.size
+        chunks.append(blob[offset:offset + length])
+        offset += length
+    return tuple(chunks)
+
+
+class AudioCache:
+    """Content-addressed cache of synthesized sentences, in memory and on disk.
+
+    Entries are the audio chunks Murf produced for one sentence, kept as separate
+    chunks because the browser decodes each one independently. The memory tier is
+    an LRU bounded by ``memory_bytes``; the disk tier keeps one file per entry
+    under ``directory``. The directory may be shared by several worker processes:
+    lookups go to the file itself rather than a per-process index. Writes keep a
+    running size; when it passes ``disk_bytes``, and every _RESCAN_EVERY writes,
+    the directory is scanned and the least recently used files (by mtime, which
+    reads refresh) are removed until it fits. Disk access is blocking and runs
+    on a small dedicated pool (see ``aget``).
+    """
+
+    def __init__(self, directory: str = config.TTS_CACHE_DIR, memory_bytes: int = config.TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = config.TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> tuple of chunks
+        self._memory_size = 0
+        self._disk_entries = 0  # as of the last directory scan, plus this process's writes since
+        self._disk_size = None  # unknown until the first write scans the directory
+        self._writes_since_scan = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    @staticmethod
+    def key(voice_config: dict, audio_format: str, sample_rate: int, text: str) -> str:
+        identity = json.dumps(
+            [voice_config, audio_format, sample_rate, normalize_text(text)], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def get(self, key: str):
+        """Cached chunks for ``key`` or None, promoting disk hits into memory."""
+        with self._lock:
+            chunks = self._memory.get(key)
+            if chunks is not None:
+                self._memory.move_to_end(key)
+                tts_cache_lookups.inc("memory_hit")
+                return chunks
+
+        chunks = self._read_disk(key)
+        if chunks is None:
+            tts_cache_lookups.inc("miss")
+            return None
+        tts_cache_lookups.inc("disk_hit")
+        self._remember(key, chunks)
+        return chunks
+
+    def set(self, key: str, chunks):
+        chunks = tuple(chunks)
+        if not chunks:
+            return
+        self._remember(key, chunks)
+        self._write_disk(key, chunks)
+
+    async def aget(self, key: str):
+        # Memory hits are answered inline; only disk lookups go to the pool
+        with self._lock:
+            in_memory = key in self._memory
+        if in_memory:
+            return self.get(key)
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.get, key)
+
+    async def aset(self, key: str, chunks):
+        await asyncio.get_running_loop().run_in_executor(_executor, self.set, key, chunks)
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": self._disk_entries,
+            "disk_bytes": self._disk_size or 0,
+        }
+
+    def _remember(self, key, chunks):
+        size = sum(len(chunk) for chunk in chunks)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= sum(len(chunk) for chunk in previous)
+            self._memory[key] = chunks
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= sum(len(chunk) for chunk in evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".bin")
+
+    def _read_disk(self, key):
+        if self.disk_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Could not read TTS cache entry {key[:12]}: {e}")
+            return None
+        try:
+            chunks = _unpack_chunks(blob)
+        except struct.error as e:
+            logging.warning(f"Dropping unreadable TTS cache entry {key[:12]}: {e}")
+            self._forget_disk(key)
+            return None
+        try:
+            os.utime(path)  # recency is the file's mtime, shared by every worker
+        except OSError:
+            pass  # evicted by another worker meanwhile
+        return chunks
+
+    def _write_disk(self, key, chunks):
+        if self.disk_bytes <= 0:
+            return
+        blob = _pack_chunks(chunks)
+        if len(blob) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write TTS cache entry: {e}")
+            return
+
+        with self._evict_lock:
+            # A running total between scans; the scan also counts other workers' files
+            self._writes_since_scan += 1
+            if self._disk_size is not None and self._writes_since_scan < _RESCAN_EVERY:
+                self._disk_size += len(blob) - replaced
+                self._disk_entries += 0 if replaced else 1
+                if self._disk_size <= self.disk_bytes:
+                    return
+            self._scan_disk(keep=path)
+
+    def _scan_disk(self, keep: str = None):
+        """Size the whole directory and drop the oldest files beyond ``disk_bytes``.
+
+        Called with the eviction lock held.
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".bin"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue  # removed by another worker
+                    entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        kept = len(entries)
+        for _, path, size in entries:
+            if total <= self.disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            kept -= 1
+        self._disk_size = total
+        self._disk_entries = kept
+        self._writes_since_scan = 0
+
+    def _forget_disk(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+audio_cache = AudioCache() if config.TTS_CACHE_ENABLED else None
+metrics.Gauge("voice_tts_cache_memory_bytes", "Audio held in the in-memory TTS cache.",
+              function=lambda: audio_cache.stats()["memory_bytes"] if audio_cache else 0)
+
+
+class _Sentence:
+    def __init__(self, chunks=None, context_id=None, queue=None, key=None):
+        self.chunks = chunks  # cached audio, or None while Murf synthesizes it
+        self.context_id = context_id
+        self.queue = queue
+        self.key = key  # set when this context holds exactly one sentence to cache
+
+
+class CachedSpeech:
+    """One turn's speech, with recurring sentences served from the audio cache.
+
+    Only two kinds of sentence are cached, because only they recur: fixed
+    strings said with ``cacheable=True``, and the opening sentence of a reply
+    when it is at most TTS_CACHE_OPENING_MAX_CHARS long (greetings, short
+    answers, and whole replies that fit in one chunk). Those are looked up in
+    the cache and, on a miss, sent to Murf in a context of their own so their
+    audio can be stored once Murf marks it final. Every other sentence skips
+    the cache and streams into one Murf context shared by the turn, so Murf
+    keeps prosody across sentence boundaries and no lookup delays it. With the
+    cache disabled every sentence goes to the shared context. ``audio()``
+    yields raw audio chunks in order and ends after ``finish()`` once
+    everything has played.
+    """
+
+    def __init__(self, tts_stream, context_prefix: str, cache: AudioCache = None):
+        self.tts_stream = tts_stream
+        self.context_prefix = context_prefix
+        self.cache = cache or audio_cache
+        self._sentences = asyncio.Queue()
+        self._open_contexts = set()
+        self._stream_context = None  # shared context currently taking uncached sentences
+        self._count = 0
+        self._said = 0
+        self.cached_sentences = 0
+
+    async def say(self, text: str, cacheable: bool = False):
+        if not text or not text.strip():
+            return
+        opening = self._said == 0
+        self._said += 1
+        if self.cache and (cacheable or (opening and len(normalize_text(text)) <= config.TTS_CACHE_OPENING_MAX_CHARS)):
+            key = self.cache.key(self.tts_stream.voice_config, self.tts_stream.audio_format,
+                                 self.tts_stream.sample_rate, text)
+            chunks = await self.cache.aget(key)
+            await self._end_stream_context()
+            if chunks:
+                self.cached_sentences += 1
+                self._sentences.put_nowait(_Sentence(chunks=chunks))
+                return
+            context_id, queue = await self._open_context()
+            await self.tts_stream.send_text(context_id, text, end=True)
+            self._sentences.put_nowait(_Sentence(context_id=context_id, queue=queue, key=key))
+            return
+
+        if self._stream_context is None:
+            context_id, queue = await self._open_context()
+            self._stream_context = context_id
+            self._sentences.put_nowait(_Sentence(context_id=context_id, queue=queue))
+        await self.tts_stream.send_text(self._stream_context, text)
+
+    async def _open_context(self):
+        context_id = f"{self.context_prefix}-{self._count}"
+        self._count += 1
+        queue = await self.tts_stream.open_context(context_id)
+        self._open_contexts.add(context_id)
+        return context_id, queue
+
+    async def _end_stream_context(self):
+        if self._stream_context is not None:
+            context_id, self._stream_context = self._stream_context, None
+            await self.tts_stream.send_text(context_id, "", end=True)
+
+    async def finish(self):
+        await self._end_stream_context()
+        self._sentences.put_nowait(None)
+
+    async def audio(self):
+        while True:
+            sentence = await self._sentences.get()
+            if sentence is None:
+                return
+            if sentence.chunks is not None:
+                for chunk in sentence.chunks:
+                    yield chunk
+                continue
+
+            # If the consumer is cancelled mid-sentence the context stays open for close() to clear
+            chunks = []
+            while True:
+                response = await sentence.queue.get()
+                if response is None:
+                    break  # connection lost; this sentence is incomplete
+                if response.get("audio"):
+                    chunk = base64.b64decode(response["audio"])
+                    chunks.append(chunk)
+                    yield chunk
+                if response.get("final"):
+                    if sentence.key and chunks:
+                        task = asyncio.create_task(self.cache.aset(sentence.key, chunks))
+                        _background_writes.add(task)
+                        task.add_done_callback(_background_writes.discard)
+                    break
+            self._close_context(sentence.context_id)
+
+    async def close(self):
+        """End the turn's speech; sentences Murf has not finished (after a barge-in) are cleared."""
+        for context_id in list(self._open_contexts):
+            self._open_contexts.discard(context_id)
+            await self.tts_stream.clear_context(context_id)
+
+    def _close_context(self, context_id):
+        self._open_contexts.discard(context_id)
+        self.tts_stream.close_context(context_id)
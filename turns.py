@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+import time
+
+import config
+import metrics
+
+barge_in_seconds = metrics.Histogram(
+    "voice_barge_in_seconds",
+    "Time from a barge-in to the client being told to stop (silence) and to the old turn releasing its resources.",
+    ["stage"],
+)
+
+
+class Turn:
+    """Resources held by one in-flight response, registered as the turn acquires them."""
+
+    def __init__(self):
+        self.task = None
+        self.llm_stream = None  # llm_stream.ThreadedStream
+        self.llm_slot = None  # admission.TurnSlot
+        self.cancelled = False
+
+    def done(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    def llm_finished(self):
+        """Gemini is done with this turn; let another turn have its slot."""
+        if self.llm_slot:
+            self.llm_slot.release()
+
+    def cancel(self):
+        self.cancelled = True
+        # Free the Gemini worker thread and stop paying for tokens nobody will hear
+        if self.llm_stream:
+            self.llm_stream.close()
+        # Unwinding the task stops audio forwarding and clears its Murf contexts
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+class TurnScheduler:
+    """Runs a session's voice turns one at a time and owns their cancellation.
+
+    ``start`` is called on the event loop with a coroutine factory taking the new
+    ``Turn``; if a turn is still running it is interrupted first. Interrupting
+    tells the client to flush its audio right away, then gives the old turn up
+    to ``BARGE_IN_GRACE_SECONDS`` to unwind before the new one starts.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.current = None
+        self._lock = asyncio.Lock()
+
+    def busy(self) -> bool:
+        """Whether a turn is in progress; safe to call from other threads."""
+        turn = self.current
+        return turn is not None and not turn.done()
+
+    async def start(self, run_turn) -> Turn:
+        async with self._lock:
+            if self.busy():
+                metrics.barge_ins_total.inc()
+                await self.interrupt()
+            turn = Turn()
+            turn.task = asyncio.create_task(run_turn(turn))
+            self.current = turn
+            return turn
+
+    async def interrupt(self, notify_client: bool = True):
+        turn = self.current
+        if turn is None or turn.done():
+            return
+        started = time.monotonic()
+        logging.warning("User interrupted while previous response was generating. Cancelling turn.")
+        turn.cancel()
+        if notify_client:
+            try:
+                await self.websocket.send_text(json.dumps({"type": "audio_interrupt"}))
+            except Exception as e:
+                logging.warning(f"Could not send audio_interrupt: {e}")
+            barge_in_seconds.observe(time.monotonic() - started, "silence")
+
+        done, _ = await asyncio.wait({turn.task}, timeout=config.BARGE_IN_GRACE_SECONDS)
+        if not done:
+            logging.warning(f"Interrupted turn still unwinding after {config.BARGE_IN_GRACE_SECONDS}s; moving on.")
+        barge_in_seconds.observe(time.monotonic() - started, "released")
+
+    async def close(self):
+        """Cancel whatever is running when the session ends."""
+        await self.interrupt(notify_client=False)
@@ -0,0 +1,112 @@
+import logging
+
+import config
+
+# numpy is optional (audio is streamed ungated without it) and only imported
+# once a gate is created, so processes that never serve voice skip it
+np = None
+
+FRAME_MS = 10
+
+
+class VoiceActivityGate:
+    """Energy + zero-crossing voice activity detector for 16-bit mono PCM.
+
+    ``process`` takes one ingest packet and returns the bytes to forward to the
+    STT service, or ``None`` to suppress it. Speech (plus ``hangover_ms`` of
+    trailing silence, so end-of-turn detection still sees the pause) is passed
+    through with one packet of pre-roll; during longer silences only a short
+    packet of digital silence is sent every ``keepalive_ms``.
+    """
+
+    def __init__(self, sample_rate: int = 16000, threshold_db: float = config.VAD_THRESHOLD_DB,
+                 hangover_ms: int = config.VAD_HANGOVER_MS, keepalive_ms: int = config.VAD_KEEPALIVE_MS,
+                 max_zcr: float = 0.35, min_speech_frames: int = 2):
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.hangover_ms = hangover_ms
+        self.keepalive_ms = keepalive_ms
+        self.max_zcr = max_zcr
+        self.min_speech_frames = min_speech_frames
+
+        self._noise_floor_db = threshold_db - 10.0
+        self._silence_ms = hangover_ms  # start gated until speech is heard
+        self._since_keepalive_ms = 0
+        self._preroll = b""
+
+        self.bytes_in = 0
+        self.bytes_passed = 0
+        self.bytes_suppressed = 0
+        self.keepalive_bytes = 0
+
+    def is_speech(self, packet: bytes) -> bool:
+        samples = np.frombuffer(packet, dtype=np.int16)
+        frame_count = len(samples) // self.frame_samples
+        if frame_count == 0:
+            return False
+        frames = samples[:frame_count * self.frame_samples].reshape(frame_count, self.frame_samples).astype(np.float32)
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+        energy_db = 20.0 * np.log10(rms + 1e-9)
+        zcr = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+
+        # Adapt to the room: speech must clear both the fixed threshold and the noise floor
+        threshold = max(self.threshold_db, self._noise_floor_db + 10.0)
+        speech_frames = (energy_db > threshold) & (zcr < self.max_zcr)
+        quiet = energy_db[~speech_frames]
+        if quiet.size:
+            self._noise_floor_db = 0.95 * self._noise_floor_db + 0.05 * float(np.median(quiet))
+        return int(speech_frames.sum()) >= self.min_speech_frames
+
+    def process(self, packet: bytes):
+        packet_ms = len(packet) * 1000 // (2 * self.sample_rate)
+        self.bytes_in += len(packet)
+
+        if self.is_speech(packet):
+            self._silence_ms = 0
+        else:
+            self._silence_ms += packet_ms
+
+        if self._silence_ms < self.hangover_ms:
+            out = self._preroll + packet
+            self.bytes_suppressed -= len(self._preroll)
+            self._preroll = b""
+            self._since_keepalive_ms = 0
+            self.bytes_passed += len(out)
+            return out
+
+        self._preroll = packet
+        self.bytes_suppressed += len(packet)
+        self._since_keepalive_ms += packet_ms
+        if self._since_keepalive_ms >= self.keepalive_ms:
+            self._since_keepalive_ms = 0
+            keepalive = bytes(len(packet))
+            self.keepalive_bytes += len(keepalive)
+            return keepalive
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_passed": self.bytes_passed,
+            "bytes_suppressed": self.bytes_suppressed,
+            "keepalive_bytes": self.keepalive_bytes,
+            "noise_floor_db": round(self._noise_floor_db, 1),
+        }
+
+
+def create_vad_gate(sample_rate: int = 16000):
+    """Return a VoiceActivityGate if VAD is enabled and numpy is installed, else None."""
+    global np
+    if not config.VAD_ENABLED:
+        return None
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    if np is None:
+        logging.warning("VAD_ENABLED is set but numpy is not installed; streaming audio ungated.")
+        return None
+    return VoiceActivityGate(sample_rate=sample_rate)